@@ -11,16 +11,44 @@ histograms and frequency tables — no individual-level data.
 Usage:
     python3 aggregate_data.py
     python3 aggregate_data.py --input mydata.json --output myagg.json
+    python3 aggregate_data.py --input cohort.ndjson --stream
+    python3 aggregate_data.py --input cohort.json --append batch_07.json
+    python3 aggregate_data.py --input mydata.json --engine numpy --workers 4
+    python3 aggregate_data.py --input mydata.json --ci --workers 4
+    python3 aggregate_data.py shard --input site1.json --state site1.state.json
+    python3 aggregate_data.py merge site1.state.json site2.state.json --output myagg.json
+    python3 aggregate_data.py release releases.json --input mydata.json
 
-Requirements: Python 3.8+  (no external packages needed)
+Requirements: Python 3.8+  (no external packages needed; NumPy optional, for --engine numpy and --ci)
 """
 
 import json
 import math
+import gc
+import gzip
+import hashlib
+import mmap
+import os
+import re
+import sys
+import time
 import argparse
+import contextlib
+import cProfile
+import multiprocessing
+import pstats
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate, chain, islice, repeat
 from pathlib import Path
 from datetime import datetime, timezone
 
+try:
+    import resource
+except ImportError:         # not available on Windows
+    resource = None
+
 # ── Built-in schema (mirrors app.js SCHEMA) ─────────────────────────────────
 SCHEMA = {
     "R0_TCode":               {"desc": "Pseudo-anonymised 8-character study identifier", "group": "id",            "type": "string"},
@@ -116,6 +144,95 @@ GROUP_LABELS = {
 SENTINELS = {999, 9999}
 
 
+# ── Run profiling ────────────────────────────────────────────────────────────
+#
+# COUNTERS tallies units of work (passes over the records, column splits,
+# summarised cells, ...).  Increments happen a few thousand times per run, so
+# they are always on; a RunProfile adds phase timings and memory samples and
+# is only created for --profile.  Worker processes send their phase times
+# and counter deltas back with each task result.
+
+COUNTERS = Counter()
+
+
+def memory_sample():
+    """Current and peak resident memory of this process in MB, where the platform reports them."""
+    sample = {}
+    try:
+        with open("/proc/self/statm") as f:
+            sample["rss_mb"] = round(int(f.read().split()[1]) * mmap.PAGESIZE / (1 << 20), 1)
+    except (OSError, IndexError, ValueError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        sample["max_rss_mb"] = round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+    return sample
+
+
+class RunProfile:
+    """Phase timings, memory samples and work counters for one run.
+
+    A disabled profile (``NO_PROFILE``) makes ``phase()`` a bare null context.
+    With ``hotspots`` > 0 the run is also traced with cProfile and the
+    report lists that many functions by cumulative time.
+    """
+
+    def __init__(self, enabled=True, hotspots=0):
+        self.enabled  = enabled
+        self.hotspots = hotspots
+        self.phases   = []
+        self.start    = time.perf_counter()
+        self.counters = COUNTERS.copy()
+        self.profiler = cProfile.Profile() if enabled and hotspots else None
+        if self.profiler:
+            self.profiler.enable()
+
+    def phase(self, name):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start, memory_sample())
+
+    def add_phase(self, name, seconds, memory, worker=False):
+        if self.enabled:
+            entry = {"name": name, "seconds": round(seconds, 4), **memory}
+            if worker:
+                entry["in_worker"] = True
+            self.phases.append(entry)
+
+    def report(self, **meta):
+        """The run report as a JSON-safe dict (stops cProfile if it was running)."""
+        hotspots = []
+        if self.profiler:
+            self.profiler.disable()
+            stats = pstats.Stats(self.profiler).stats
+            top = sorted(stats.items(), key=lambda kv: -kv[1][3])[:self.hotspots]
+            for (path, line, func), (_, calls, tottime, cumtime, _) in top:
+                hotspots.append({"function": f"{Path(path).name}:{line}({func})", "calls": calls,
+                                 "tottime": round(tottime, 4), "cumtime": round(cumtime, 4)})
+        report = {
+            "meta":     dict(meta, created=datetime.now(timezone.utc).isoformat()),
+            "total_seconds": round(time.perf_counter() - self.start, 4),
+            "memory":   memory_sample(),
+            "phases":   self.phases,
+            "counters": dict(sorted((COUNTERS - self.counters).items())),
+        }
+        if self.profiler:
+            report["hotspots"] = hotspots
+        return report
+
+
+NO_PROFILE = RunProfile(enabled=False)
+
+
 # ── Statistics helpers ────────────────────────────────────────────────────────
 
 def get_valid(records, key, sentinel=None):
@@ -158,12 +275,65 @@ def numeric_stats(values):
     if not nums:
         return None
     nums.sort()
+    return sorted_stats(nums)
+
+
+class SortedCounts:
+    """An ascending sequence stored as distinct values and their counts.
+
+    Indexing, ``len()`` and iteration behave like the expanded sorted list, so
+    ``quantile()``, ``sorted_stats()`` and ``bin_values()`` accept either form
+    and give identical results without materialising every value.
+    """
+
+    __slots__ = ("values", "counts", "cum")
+
+    def __init__(self, value_counts):
+        self.values = sorted(value_counts)
+        self.counts = [value_counts[x] for x in self.values]
+        self.cum    = list(accumulate(self.counts, initial=0))
+
+    @classmethod
+    def from_sorted(cls, values, counts):
+        """From ascending distinct ``values`` and their ``counts``, already sorted."""
+        self = cls.__new__(cls)
+        self.values, self.counts = values, counts
+        self.cum = list(accumulate(counts, initial=0))
+        return self
+
+    def __len__(self):
+        return self.cum[-1]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return self.values[bisect_right(self.cum, i) - 1]
+
+    def __iter__(self):
+        return self.expand(self.values)
+
+    def expand(self, per_value):
+        """Repeat each item of ``per_value`` (aligned with ``values``) by its count."""
+        return chain.from_iterable(map(repeat, per_value, self.counts))
+
+
+def sorted_stats(nums):
+    """Summary statistics for a non-empty, ascending list of floats (or SortedCounts)."""
     n = len(nums)
-    mean = sum(nums) / n
-    variance = sum((x - mean) ** 2 for x in nums) / n
-    sd = math.sqrt(variance)
+    # fsum() is correctly rounded, so neither the Python version nor the
+    # order the values come in (shards, batches, engines) changes the result
+    mean = math.fsum(nums) / n
+    if isinstance(nums, SortedCounts):
+        variance = math.fsum(nums.expand([(x - mean) * (x - mean) for x in nums.values])) / n
+    else:
+        variance = math.fsum([(x - mean) * (x - mean) for x in nums]) / n
+    return stats_block(nums, mean, math.sqrt(variance))
+
+
+def stats_block(nums, mean, sd):
+    """sorted_stats()'s output for ascending ``nums`` with the given mean and SD."""
     return {
-        "n": n,
+        "n": len(nums),
         "mean": round(mean, 4),
         "sd": round(sd, 4),
         "median": round(quantile(nums, 0.5), 4),
@@ -175,27 +345,46 @@ def numeric_stats(values):
 
 
 def make_histogram(values, is_integer=False, target_bins=30, min_cell=0):
-    nums = [float(v) for v in values]
+    nums = sorted(float(v) for v in values)
     if not nums:
         return {"labels": [], "counts": []}
-    lo, hi = min(nums), max(nums)
-    rng = hi - lo
-    if rng == 0:
-        # All values identical — single bin; suppress if below threshold
-        cnt = len(nums)
-        return {"labels": [str(round(lo, 2))],
-                "counts": [None if (min_cell > 0 and cnt < min_cell) else cnt]}
+    return bin_values(nums, nums[0], nums[-1], is_integer, target_bins, min_cell)
 
+
+def bin_counts(nums, n_bins, bin_of):
+    """Per-bin counts for ascending ``nums`` under a non-decreasing ``bin_of``.
+
+    Rather than binning every value, each bin boundary is located by binary
+    search, so the cost is O(n_bins · log n) instead of O(n).
+    """
+    counts, start, n = [], 0, len(nums)
+    for b in range(n_bins):
+        lo, hi = start, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bin_of(nums[mid]) <= b:
+                lo = mid + 1
+            else:
+                hi = mid
+        counts.append(lo - start)
+        start = lo
+    return counts
+
+
+def bin_layout(lo, hi, is_integer=False, target_bins=30):
+    """Histogram bins for values spanning ``lo``..``hi`` (with ``lo < hi``).
+
+    Returns ``(labels, origin, step, rounded, trim)``.  A value ``v`` falls in
+    bin ``int(round(v)) - origin`` when ``rounded`` (one bar per integer),
+    otherwise in ``min(len(labels) - 1, int((v - origin) / step))``.  ``trim``
+    marks layouts whose trailing empty bins are dropped.
+    """
+    rng = hi - lo
     if is_integer and rng <= 50:
         # One bar per integer value
         lo_i, hi_i = int(round(lo)), int(round(hi))
-        labels = [str(v) for v in range(lo_i, hi_i + 1)]
-        counts = [0] * len(labels)
-        for v in nums:
-            idx = int(round(v)) - lo_i
-            if 0 <= idx < len(counts):
-                counts[idx] += 1
-    elif is_integer:
+        return [str(v) for v in range(lo_i, hi_i + 1)], lo_i, 1, True, False
+    if is_integer:
         step = max(1, math.ceil(rng / target_bins))
         n_bins = math.ceil((rng + 1) / step)
         labels = []
@@ -203,17 +392,14 @@ def make_histogram(values, is_integer=False, target_bins=30, min_cell=0):
             bin_lo = lo + i * step
             bin_hi = min(bin_lo + step - 1, hi)
             labels.append(str(int(round(bin_lo))) if step == 1 else f"{int(round(bin_lo))}–{int(round(bin_hi))}")
-        counts = [0] * n_bins
-        for v in nums:
-            idx = min(n_bins - 1, int((v - lo) / step))
-            counts[idx] += 1
-    else:
-        step = rng / target_bins
-        labels = [f"{lo + i * step:.2f}" for i in range(target_bins)]
-        counts = [0] * target_bins
-        for v in nums:
-            idx = min(target_bins - 1, int((v - lo) / step))
-            counts[idx] += 1
+        return labels, lo, step, False, False
+    step = rng / target_bins
+    return [f"{lo + i * step:.2f}" for i in range(target_bins)], lo, step, False, True
+
+
+def finish_histogram(labels, counts, trim=False, min_cell=0):
+    """Drop trailing empty bins (when ``trim``) and null out small ones."""
+    if trim:
         # Remove trailing empty bins
         while counts and counts[-1] == 0:
             counts.pop()
@@ -226,11 +412,82 @@ def make_histogram(values, is_integer=False, target_bins=30, min_cell=0):
     return {"labels": labels, "counts": counts}
 
 
+def single_bin(lo, cnt, min_cell=0):
+    """Histogram for a variable whose values are all identical."""
+    # Single bin; suppress if below threshold
+    return {"labels": [str(round(lo, 2))],
+            "counts": [None if (min_cell > 0 and cnt < min_cell) else cnt]}
+
+
+def bin_index(layout):
+    """The function mapping a value to its bin under a bin_layout() tuple."""
+    labels, origin, step, rounded, _ = layout
+    n_bins = len(labels)
+    if rounded:
+        return lambda v: int(round(v)) - origin
+    return lambda v: min(n_bins - 1, int((v - origin) / step))
+
+
+def bin_fill(nums, layout):
+    """Per-bin counts of ascending ``nums`` under a bin_layout() tuple."""
+    return bin_counts(nums, len(layout[0]), bin_index(layout))
+
+
+def bin_values(nums, lo, hi, is_integer=False, target_bins=30, min_cell=0):
+    """Histogram of an ascending list of floats spanning ``lo``..``hi``."""
+    if hi == lo:
+        return single_bin(lo, len(nums), min_cell)
+
+    layout = bin_layout(lo, hi, is_integer, target_bins)
+    return finish_histogram(layout[0], bin_fill(nums, layout), layout[4], min_cell)
+
+
+def shared_bins(vtype, nums, target_bins=30):
+    """Whole-cohort bin layout for a numeric variable, or None if it has no values.
+
+    ``nums`` is the cohort's ascending valid values.  Every stratum of the
+    variable is then binned against this one layout (see bin_layout()), so
+    their histograms line up bin for bin.  A constant variable gets a single
+    bin, which the non-rounded arithmetic maps every value into.
+    """
+    if not len(nums):
+        return None
+    lo, hi = float(nums[0]), float(nums[-1])
+    if hi == lo:
+        return [str(round(lo, 2))], lo, 1, False, False
+    return bin_layout(lo, hi, vtype == "integer", target_bins)
+
+
+def bin_edges(layout):
+    """The ``n_bins + 1`` boundaries of a bin layout (half-integers when rounded)."""
+    labels, origin, step, rounded, _ = layout
+    start = origin - 0.5 if rounded else origin
+    return [round(start + i * step, 4) for i in range(len(labels) + 1)]
+
+
+def value_key(v):
+    """Frequency-table / stratum key for a raw value (1.0 and 1 both map to "1")."""
+    return str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+
+
+def code_label(k, codes):
+    """Display label for frequency key ``k`` under a schema ``codes`` map."""
+    try:
+        return str(codes.get(int(k), codes.get(k, k)))
+    except (ValueError, TypeError):
+        return str(codes.get(k, k))
+
+
 def freq_table(values, codes=None, min_cell=0):
     counts = {}
     for v in values:
-        k = str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+        k = value_key(v)
         counts[k] = counts.get(k, 0) + 1
+    return freq_from_counts(counts, codes, min_cell)
+
+
+def freq_from_counts(counts, codes=None, min_cell=0):
+    """Frequency table from ``{key: count}`` in first-seen order (ties keep that order)."""
     result = {}
     for k, cnt in sorted(counts.items(), key=lambda x: -x[1]):
         label = str(codes.get(int(k), codes.get(k, k))) if codes else k
@@ -243,189 +500,2544 @@ def freq_table(values, codes=None, min_cell=0):
 
 # ── Per-variable aggregation ─────────────────────────────────────────────────
 
-def aggregate_variable(key, records, schema_entry, min_cell=0):
-    vtype    = schema_entry.get("type", "numeric")
-    sentinel = schema_entry.get("sentinel")
-    codes    = schema_entry.get("codes")
-    n_total  = len(records)
+NUMERIC_TYPES = ("numeric", "integer")
+CODED_TYPES   = ("categorical", "binary")
 
-    n_null     = count_null(records, key)
-    n_sentinel = count_sentinel(records, key, sentinel)
-    valid_vals = get_valid(records, key, sentinel)
 
+def summarise(vtype, codes, n_total, n_null, n_sentinel, n_valid, valid, min_cell=0, engine=None,
+              bins=None):
+    """Build one variable's output block from pre-tallied counts.
+
+    ``valid`` is an ascending sequence of floats for numeric/integer variables
+    (in the form ``engine`` works on) and a first-seen-ordered ``{key: count}``
+    dict for categorical/binary ones.  With a shared ``bins`` layout (see
+    shared_bins()) the histogram holds only counts against it; without one
+    the bins are fitted to ``valid`` and carry their own labels.
+    """
+    engine = engine or PYTHON_ENGINE
+    COUNTERS["cells_summarised"] += 1
     result = {
         "n_total":    n_total,
-        "n_valid":    len(valid_vals),
+        "n_valid":    n_valid,
         "n_null":     n_null,
         "n_sentinel": n_sentinel,
     }
 
-    if vtype in ("numeric", "integer"):
-        stats = numeric_stats(valid_vals)
-        if stats:
-            result.update(stats)
-        result["histogram"] = make_histogram(valid_vals, is_integer=(vtype == "integer"), min_cell=min_cell)
+    if vtype in NUMERIC_TYPES:
+        if not n_valid:
+            result["histogram"] = {"counts": []} if bins else {"labels": [], "counts": []}
+        elif bins:
+            result.update(engine.sorted_stats(valid))
+            counts = finish_histogram(bins[0], engine.bin_fill(valid, bins), min_cell=min_cell)["counts"]
+            result["histogram"] = {"counts": counts}
+        else:
+            result.update(engine.sorted_stats(valid))
+            result["histogram"] = engine.bin_values(valid, float(valid[0]), float(valid[-1]),
+                                                    is_integer=(vtype == "integer"), min_cell=min_cell)
 
-    elif vtype in ("categorical", "binary"):
-        result["frequencies"] = freq_table(valid_vals, codes, min_cell=min_cell)
+    elif vtype in CODED_TYPES:
+        result["frequencies"] = freq_from_counts(valid, codes, min_cell=min_cell)
 
     return result
 
 
-# ── Main aggregation ─────────────────────────────────────────────────────────
+def aggregate_variable(key, records, schema_entry, min_cell=0):
+    vtype    = schema_entry.get("type", "numeric")
+    sentinel = schema_entry.get("sentinel")
+    codes    = schema_entry.get("codes")
+    COUNTERS["aggregate_variable_calls"] += 1
+    COUNTERS["record_scans"] += 3      # get_valid, count_null, count_sentinel
+
+    valid_vals = get_valid(records, key, sentinel)
+    if vtype in NUMERIC_TYPES:
+        valid = sorted(float(v) for v in valid_vals)
+    else:
+        valid = {}
+        for v in valid_vals:
+            k = value_key(v)
+            valid[k] = valid.get(k, 0) + 1
 
-def aggregate(data, schema, min_cell=5):
-    """Produce the full aggregated output dict."""
+    return summarise(vtype, codes, len(records), count_null(records, key),
+                     count_sentinel(records, key, sentinel), len(valid_vals), valid, min_cell)
 
-    suppressed_strata = 0
-    suppressed_cells  = 0
 
-    # Identify stratification variables (categorical/binary with codes, not id group)
-    strat_vars = [
+def output_variables(schema, data_keys):
+    """Schema keys that get aggregated: present in the data, not strings/ids."""
+    return [
         k for k, s in schema.items()
-        if s.get("type") in ("categorical", "binary")
-        and s.get("codes")
-        and s.get("group") != "id"
-        and k in data[0]
+        if s.get("type") != "string" and s.get("group") != "id" and k in data_keys
     ]
 
-    # Build whole-cohort stats
-    # Apply histogram bin suppression (min_cell) but not frequency suppression
-    # (whole-cohort counts are large; strata get full suppression)
-    print(f"  Aggregating whole cohort (n={len(data)})…")
-    whole_cohort = {}
-    for key, s in schema.items():
-        if s.get("type") == "string" or s.get("group") == "id":
-            continue
-        if key not in data[0]:
-            continue
-        whole_cohort[key] = aggregate_variable(key, data, s, min_cell=min_cell)
 
-    # Build stratified stats for every stratification variable
-    strata_out = {}
-    for strat_key in strat_vars:
-        strat_schema = schema[strat_key]
-        print(f"  Stratifying by {strat_key}…")
+# ── Columnar engine ──────────────────────────────────────────────────────────
+#
+# The record list is decoded once into one column per variable.  Whole-cohort
+# and stratified statistics are then tallied from those columns: a stratum is
+# a per-row stratum number, so splitting a variable across all strata of a
+# stratifier is a single walk over that variable's column.
 
-        # Group records by stratum value
-        groups = {}
-        for rec in data:
-            gv = rec.get(strat_key)
-            if gv is None:
-                continue
-            gk = str(int(gv)) if isinstance(gv, float) and gv.is_integer() else str(gv)
-            groups.setdefault(gk, []).append(rec)
+def build_column(raw, schema_entry):
+    """Decode one variable's raw values (one per record) into a typed column.
 
-        strat_out = {}
-        codes = strat_schema.get("codes", {})
-        for gk, grp_records in sorted(groups.items()):
-            try:
-                label = str(codes.get(int(gk), codes.get(gk, gk)))
-            except (ValueError, TypeError):
-                label = str(codes.get(gk, gk))
+    Every column lists its null rows, its sentinel rows and its valid rows.
+    Numeric/integer columns hold the valid values as ascending floats, with
+    ``rows`` giving each value's record number.  Categorical/binary columns
+    hold an integer code per record (-1 for null) indexing ``keys``; sentinel
+    values get a code too, since they still form strata.
+    """
+    vtype    = schema_entry.get("type", "numeric")
+    sentinel = schema_entry.get("sentinel")
 
-            n_grp = len(grp_records)
+    null_rows, sent_rows, valid_rows = [], [], []
+    for i, v in enumerate(raw):
+        if v is None:
+            null_rows.append(i)
+        elif sentinel is not None and (v == sentinel or v in SENTINELS):
+            # Mirrors count_sentinel: 999 is excluded but not counted when the
+            # variable's own sentinel is 9999
+            if v == sentinel or (sentinel != 9999 and v == 9999):
+                sent_rows.append(i)
+        else:
+            valid_rows.append(i)
 
-            # Suppress entire stratum if too small
-            if min_cell > 0 and n_grp < min_cell:
-                strat_out[gk] = {"label": label, "n": None, "suppressed": True}
-                suppressed_strata += 1
-                continue
+    col = {"type": vtype, "n": len(raw), "null_rows": null_rows,
+           "sent_rows": sent_rows, "rows": valid_rows}
 
-            grp_stats = {"label": label, "n": n_grp, "variables": {}}
-            for key, s in schema.items():
-                if s.get("type") == "string" or s.get("group") == "id":
-                    continue
-                if key not in data[0]:
-                    continue
-                var_stats = aggregate_variable(key, grp_records, s, min_cell=min_cell)
-                # Count suppressed frequency cells
-                if "frequencies" in var_stats:
-                    suppressed_cells += sum(
-                        1 for fc in var_stats["frequencies"].values()
-                        if fc.get("suppressed")
-                    )
-                grp_stats["variables"][key] = var_stats
-            strat_out[gk] = grp_stats
+    if vtype in NUMERIC_TYPES:
+        fv = [float(raw[i]) for i in valid_rows]
+        order = sorted(range(len(fv)), key=fv.__getitem__)
+        col["values"] = [fv[j] for j in order]
+        col["rows"]   = [valid_rows[j] for j in order]
 
-        strata_out[strat_key] = strat_out
+    elif vtype in CODED_TYPES:
+        # Code the raw values first so value_key() runs once per distinct
+        # value, then merge raw values sharing a key (e.g. 1 and "1")
+        index, keys, key_code = {}, [], {}
+        codes = [-1] * len(raw)
+        for i, v in enumerate(raw):
+            if v is not None:
+                c = index.get(v)
+                if c is None:
+                    k = value_key(v)
+                    c = key_code.get(k)
+                    if c is None:
+                        c = key_code[k] = len(keys)
+                        keys.append(k)
+                    index[v] = c
+                codes[i] = c
+        col["keys"]  = keys
+        col["codes"] = codes
 
-    print(f"  Suppression (min_cell={min_cell}): {suppressed_strata} strata suppressed, "
-          f"{suppressed_cells} frequency cells suppressed.")
+    return col
 
-    return whole_cohort, strata_out, strat_vars, suppressed_strata, suppressed_cells
 
+def build_columns(data, keys, schema):
+    """Decode ``data`` into ``{key: column}`` for each aggregated variable."""
+    COUNTERS["record_scans"] += len(keys)
+    COUNTERS["records_decoded"] += len(data)
+    return {key: build_column([r.get(key) for r in data], schema[key]) for key in keys}
 
-def build_schema_block(schema):
-    """Serialise schema to a JSON-safe dict (convert int keys to strings)."""
-    out = {}
-    for key, s in schema.items():
-        if s.get("group") == "id":
-            continue
-        entry = {k: v for k, v in s.items() if k != "codes"}
-        if s.get("codes"):
-            entry["codes"] = {str(k): v for k, v in s["codes"].items()}
-        out[key] = entry
-    return out
 
+def strata_index(col):
+    """Stratum membership for a coded column.
 
-# ── Entry point ──────────────────────────────────────────────────────────────
+    Returns ``(keys, members, sizes)``: stratum keys in output (sorted) order,
+    the stratum number of every record (-1 when null) and each stratum's size.
+    """
+    keys  = col["keys"]
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    rank  = [0] * len(keys)
+    for pos, c in enumerate(order):
+        rank[c] = pos
+    members = [rank[c] if c >= 0 else -1 for c in col["codes"]]
+    sizes = [0] * len(keys)
+    for m in members:
+        if m >= 0:
+            sizes[m] += 1
+    return [keys[c] for c in order], members, sizes
 
-def main():
-    parser = argparse.ArgumentParser(description="Aggregate individual-level data for the Generations dashboard.")
-    parser.add_argument("--input",    default="synthetic_data.json",  help="Input JSON file (array of records)")
-    parser.add_argument("--output",   default="aggregated_data.json", help="Output aggregated JSON file")
-    parser.add_argument("--min-cell", default=5, type=int,
-                        help="Suppress frequency counts below this threshold (default: 5)")
-    args = parser.parse_args()
-    min_cell = args.min_cell
 
-    input_path  = Path(args.input)
-    output_path = Path(args.output)
+def _tally_rows(rows, members, n_strata):
+    tally = Counter(map(members.__getitem__, rows))
+    return [tally.get(s, 0) for s in range(n_strata)]
 
-    print(f"Reading {input_path}…")
-    with open(input_path) as f:
-        data = json.load(f)
 
-    if not isinstance(data, list):
-        raise ValueError("Input must be a JSON array of records.")
-    print(f"  {len(data):,} records loaded.")
+def column_cells(col, members=None, n_strata=1):
+    """Split a column across strata.
+
+    Returns per-stratum lists ``(n_null, n_sentinel, n_valid, valid)`` where
+    ``valid`` entries are what ``summarise`` expects.  With ``members=None``
+    the whole column is a single stratum.
+    """
+    vtype = col["type"]
+    rows  = col["rows"]
+    if members is None:
+        if vtype in NUMERIC_TYPES:
+            valid = col["values"]
+        elif vtype in CODED_TYPES:
+            keys = col["keys"]
+            valid = {keys[c]: n for c, n in Counter(map(col["codes"].__getitem__, rows)).items()}
+        else:
+            valid = None
+        return [len(col["null_rows"])], [len(col["sent_rows"])], [len(rows)], [valid]
+
+    n_null = _tally_rows(col["null_rows"], members, n_strata)
+    n_sent = _tally_rows(col["sent_rows"], members, n_strata)
+
+    if vtype in NUMERIC_TYPES:
+        # Walking the values in ascending order keeps every bucket sorted
+        buckets = [[] for _ in range(n_strata)]
+        append = [b.append for b in buckets]
+        for s, x in zip(map(members.__getitem__, rows), col["values"]):
+            if s >= 0:
+                append[s](x)
+        return n_null, n_sent, [len(b) for b in buckets], buckets
+
+    if vtype in CODED_TYPES:
+        keys, codes = col["keys"], col["codes"]
+        tallies = [{} for _ in range(n_strata)]
+        for s, c in zip(map(members.__getitem__, rows), map(codes.__getitem__, rows)):
+            if s >= 0:
+                t = tallies[s]
+                t[c] = t.get(c, 0) + 1
+        valid = [{keys[c]: n for c, n in t.items()} for t in tallies]
+        return n_null, n_sent, [sum(t.values()) for t in tallies], valid
+
+    n_valid = _tally_rows(rows, members, n_strata)
+    return n_null, n_sent, n_valid, [None] * n_strata
+
+
+def pair_members(members_a, members_b, n_b):
+    """Per-record cell number ``a * n_b + b`` of two stratifiers' members (-1 if either is null)."""
+    return [a * n_b + b if a >= 0 and b >= 0 else -1 for a, b in zip(members_a, members_b)]
+
+
+def count_cube(members):
+    """Sparse count cube over several stratifiers' ``members`` (see strata_index()).
+
+    Returns ``{(stratum, …): n}`` with one entry per combination that occurs,
+    in order of first appearance.
+    """
+    return Counter(zip(*members))
+
+
+# ── Statistics engines ───────────────────────────────────────────────────────
+#
+# The columnar engine runs on one of two interchangeable backends.  The pure
+# Python one is the zero-dependency default; the NumPy one holds columns as
+# arrays and replaces the per-value loops with bincount tallies, vectorised
+# binning and array slicing.  Both give bit-identical statistics: means and
+# variances are math.fsum() over the same IEEE differences and products
+# (``d * d``, not ``d ** 2``, which goes through libm pow), and quantiles
+# interpolate between the same order statistics, which the single argsort at
+# decode time turns into plain lookups.  tests/test_engine_parity.py checks
+# this.
+
+class PythonEngine:
+    """Pure-Python statistics backend."""
+
+    name = "python"
+
+    def build_columns(self, data, keys, schema):
+        return self.adopt_columns(build_columns(data, keys, schema))
+
+    def adopt_columns(self, columns):
+        """Bring decoded columns (lists, or memoryviews from the cache) into this engine's form."""
+        # Element access on a memoryview is slower than on a list, and
+        # tolist() is a single C-level copy
+        return materialise_columns(columns)
+
+    def strata_index(self, col):
+        return strata_index(col)
+
+    def column_cells(self, col, members=None, n_strata=1):
+        return column_cells(col, members, n_strata)
+
+    def pair_members(self, members_a, members_b, n_b):
+        return pair_members(members_a, members_b, n_b)
+
+    def count_cube(self, members):
+        return count_cube(members)
+
+    def sorted_stats(self, nums):
+        return sorted_stats(nums)
+
+    def bin_fill(self, nums, layout):
+        return bin_fill(nums, layout)
+
+    def bin_values(self, nums, lo, hi, is_integer=False, target_bins=30, min_cell=0):
+        if hi == lo:
+            return single_bin(lo, len(nums), min_cell)
+        layout = bin_layout(lo, hi, is_integer, target_bins)
+        return finish_histogram(layout[0], self.bin_fill(nums, layout), layout[4], min_cell)
+
+    def numeric_stats(self, values):
+        return numeric_stats(values)
+
+    def make_histogram(self, values, is_integer=False, target_bins=30, min_cell=0):
+        return make_histogram(values, is_integer, target_bins, min_cell)
+
+    def freq_table(self, values, codes=None, min_cell=0):
+        return freq_table(values, codes, min_cell)
+
+
+class NumpyEngine(PythonEngine):
+    """Vectorised backend; columns become NumPy arrays."""
+
+    name = "numpy"
+
+    def __init__(self):
+        try:
+            import numpy
+        except ImportError:
+            raise SystemExit("--engine numpy needs NumPy (pip install numpy); "
+                             "the default engine has no dependencies.") from None
+        self.np = numpy
+
+    def adopt_columns(self, columns):
+        np = self.np
+        # asarray() wraps cached memoryviews without copying
+        for col in columns.values():
+            for field in ("null_rows", "sent_rows", "rows", "codes"):
+                if field in col:
+                    col[field] = np.asarray(col[field], dtype=np.int64)
+            if "values" in col:
+                col["values"] = np.asarray(col["values"], dtype=np.float64)
+        return columns
+
+    def strata_index(self, col):
+        np = self.np
+        keys  = col["keys"]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        # rank[-1] = -1 sends the null code (-1) to "no stratum"
+        rank = np.full(len(keys) + 1, -1, dtype=np.int64)
+        rank[order] = np.arange(len(keys))
+        members = rank[col["codes"]]
+        sizes = np.bincount(members[members >= 0], minlength=len(keys))
+        return [keys[c] for c in order], members, sizes.tolist()
+
+    def _tally(self, strata, n_strata):
+        return self.np.bincount(strata[strata >= 0], minlength=n_strata).tolist()
+
+    def _first_seen_counts(self, cells):
+        """``(cell, count)`` pairs for an int array, in order of first appearance."""
+        np = self.np
+        uniq, first, counts = np.unique(cells, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return zip(uniq[order].tolist(), counts[order].tolist())
+
+    def column_cells(self, col, members=None, n_strata=1):
+        np = self.np
+        vtype = col["type"]
+        rows  = col["rows"]
+        if members is None:
+            if vtype in NUMERIC_TYPES:
+                valid = col["values"]
+            elif vtype in CODED_TYPES:
+                keys = col["keys"]
+                valid = {keys[c]: n for c, n in self._first_seen_counts(col["codes"][rows])}
+            else:
+                valid = None
+            return [len(col["null_rows"])], [len(col["sent_rows"])], [len(rows)], [valid]
+
+        n_null = self._tally(members[col["null_rows"]], n_strata)
+        n_sent = self._tally(members[col["sent_rows"]], n_strata)
+        strata = members[rows]
+        inside = strata >= 0
+        strata = strata[inside]
+        n_valid = np.bincount(strata, minlength=n_strata)
+
+        if vtype in NUMERIC_TYPES:
+            # A stable sort by stratum keeps each stratum's values ascending;
+            # on 16-bit keys NumPy's stable sort is a radix sort
+            keys16 = strata.astype(np.int16) if n_strata <= np.iinfo(np.int16).max else strata
+            values = col["values"][inside][np.argsort(keys16, kind="stable")]
+            return n_null, n_sent, n_valid.tolist(), np.split(values, np.cumsum(n_valid)[:-1])
+
+        if vtype in CODED_TYPES:
+            keys = col["keys"]
+            width = len(keys)
+            valid = [{} for _ in range(n_strata)]
+            for cell, cnt in self._first_seen_counts(strata * width + col["codes"][rows][inside]):
+                si, c = divmod(cell, width)
+                valid[si][keys[c]] = cnt
+            return n_null, n_sent, n_valid.tolist(), valid
+
+        return n_null, n_sent, n_valid.tolist(), [None] * n_strata
+
+    def pair_members(self, members_a, members_b, n_b):
+        np = self.np
+        return np.where((members_a >= 0) & (members_b >= 0), members_a * n_b + members_b, -1)
+
+    def count_cube(self, members):
+        np = self.np
+        table = np.stack(members, axis=1)
+        uniq, first, counts = np.unique(table, axis=0, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return dict(zip(map(tuple, uniq[order].tolist()), counts[order].tolist()))
+
+    def sorted_stats(self, nums):
+        np = self.np
+        n = len(nums)
+        # The same correctly rounded sums as sorted_stats(); np.sum() pairs
+        # terms up and would round differently
+        mean = math.fsum(nums.tolist()) / n
+        dev = nums - mean
+        variance = math.fsum((dev * dev).tolist()) / n
+        sd = math.sqrt(variance)
+        return {
+            "n": n,
+            "mean": round(mean, 4),
+            "sd": round(sd, 4),
+            "median": round(float(quantile(nums, 0.5)), 4),
+            "q1": round(float(quantile(nums, 0.25)), 4),
+            "q3": round(float(quantile(nums, 0.75)), 4),
+            "min": round(float(nums[0]), 4),
+            "max": round(float(nums[-1]), 4),
+        }
+
+    def bin_fill(self, nums, layout):
+        np = self.np
+        labels, origin, step, rounded, _ = layout
+        n_bins = len(labels)
+        if rounded:
+            idx = np.rint(nums).astype(np.int64) - origin   # rint rounds half to even, like round()
+        else:
+            idx = np.minimum(n_bins - 1, ((nums - origin) / step).astype(np.int64))
+        return np.bincount(idx, minlength=n_bins)[:n_bins].tolist()
+
+    def numeric_stats(self, values):
+        nums = self.np.sort(self.np.asarray([v for v in values if v is not None], dtype=self.np.float64))
+        return self.sorted_stats(nums) if len(nums) else None
+
+    def make_histogram(self, values, is_integer=False, target_bins=30, min_cell=0):
+        nums = self.np.asarray(values, dtype=self.np.float64)
+        if not len(nums):
+            return {"labels": [], "counts": []}
+        return self.bin_values(nums, float(nums.min()), float(nums.max()), is_integer, target_bins, min_cell)
+
+    def freq_table(self, values, codes=None, min_cell=0):
+        np = self.np
+        arr = np.asarray(values)
+        if arr.dtype.kind not in "iuf":
+            return super().freq_table(values, codes, min_cell)
+        uniq, inverse = np.unique(arr, return_inverse=True)
+        counts = {}
+        for c, n in self._first_seen_counts(inverse.ravel()):
+            counts[value_key(uniq[c].item())] = n
+        return freq_from_counts(counts, codes, min_cell)
+
+
+PYTHON_ENGINE = PythonEngine()
+ENGINES = {"python": PythonEngine, "numpy": NumpyEngine}
+
+
+def get_engine(name):
+    """Statistics backend by name: "python" (default) or "numpy"."""
+    return PYTHON_ENGINE if name == "python" else ENGINES[name]()
+
+
+# ── Column cache ─────────────────────────────────────────────────────────────
+#
+# Reruns against the same extract (tuning --min-cell, editing SCHEMA) can
+# skip json.load and the column decode: the decoded columns are stored in a
+# binary file that later runs memory-map.  The file is a magic line, an
+# 8-byte little-endian header length, a JSON header and then each column's
+# int64/float64 arrays in native byte order, each 8-byte aligned.  Arrays
+# come back as memoryviews over the map: the NumPy engine wraps them without
+# copying, the pure-Python one copies them into lists.
+#
+# A cache file is named ``<input id>-<content id>.cols``: a hash of the
+# input's resolved path, then the SHA-256 of its bytes and of SCHEMA plus the
+# layout version, so editing either simply misses the cache.  A miss also
+# deletes the input's earlier entries, so each input path keeps at most one
+# file.  It holds individual-level data: it lives in a private per-user
+# directory (mode 0700, files 0600) and is never allowed in the output's
+# directory (nor, for a --cache-dir, anywhere under it).
+
+CACHE_MAGIC   = b"GSCOLS\n"
+CACHE_VERSION = 1
+CACHE_FIELDS  = {"null_rows": "q", "sent_rows": "q", "rows": "q", "codes": "q", "values": "d"}
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "generations-aggregate"
+
+
+def check_cache_dir(cache_dir, output_path, explicit=True):
+    """Refuse a cache location in (or under) the shareable output's directory.
+
+    The default location (``explicit`` false) is refused only when it is the
+    output's directory itself: an output written in $HOME, or anywhere else
+    above ~/.cache, is a plain run and must not need --no-cache.
+    """
+    out_dir = output_path.resolve().parent
+    cache_dir = cache_dir.resolve()
+    if cache_dir == out_dir or (explicit and out_dir in cache_dir.parents):
+        raise SystemExit(f"Refusing to cache individual-level data in {cache_dir}: it is beside the "
+                         f"shareable output {output_path}.  Choose another --cache-dir or use --no-cache.")
+
+
+def cache_key(input_path):
+    """Cache file stem: hashes of the input's path, and of its content, SCHEMA and the cache layout."""
+    path_id = hashlib.sha256(str(Path(input_path).resolve()).encode("utf-8")).hexdigest()[:16]
+    h = hashlib.sha256()
+    with open(input_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    schema = json.dumps(SCHEMA, sort_keys=True, default=str).encode("utf-8")
+    h.update(hashlib.sha256(schema + b"%d" % CACHE_VERSION).digest())
+    return f"{path_id}-{h.hexdigest()[:40]}"
+
+
+def prune_column_cache(keep):
+    """Delete the cache files that ``keep`` supersedes; returns how many.
+
+    Those are the same input's entries for earlier contents or schemas.
+    """
+    path_id = keep.name.split("-")[0]
+    removed = 0
+    for path in keep.parent.glob(f"{path_id}-*.cols"):
+        if path != keep:
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def save_column_cache(path, columns, n, data_keys):
+    """Write decoded (list-valued) columns to ``path`` atomically."""
+    header = {"version": CACHE_VERSION, "byteorder": sys.byteorder, "n": n,
+              "data_keys": list(data_keys), "columns": {}}
+    blobs, offset = [], 0
+    for key, col in columns.items():
+        entry = {"type": col["type"], "n": col["n"], "arrays": {}}
+        if "keys" in col:
+            entry["keys"] = col["keys"]
+        for field, typecode in CACHE_FIELDS.items():
+            if field in col:
+                blob = array(typecode, col[field]).tobytes()
+                entry["arrays"][field] = [offset, len(col[field])]
+                blobs.append(blob)
+                offset += len(blob)
+        header["columns"][key] = entry
+
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    start = len(CACHE_MAGIC) + 8 + len(head)
+    pad = -start % 8
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(CACHE_MAGIC + (len(head) + pad).to_bytes(8, "little") + head + b" " * pad)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+def load_column_cache(path):
+    """Memory-map a cache file; returns ``(columns, n, data_keys)``, or None if missing or unusable.
+
+    A truncated or corrupt file (bad header, arrays past the end of the file,
+    array lengths that do not fit together) is unusable, like one of another
+    layout version.
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        header, base = _cache_header(mm)
+    except (ValueError, KeyError, TypeError, AttributeError):    # JSONDecodeError is a ValueError
+        mm.close()
+        return None
+
+    view = memoryview(mm)
+    columns = {}
+    for key, entry in header["columns"].items():
+        col = {"type": entry["type"], "n": entry["n"]}
+        if "keys" in entry:
+            col["keys"] = entry["keys"]
+        for field, (offset, count) in entry["arrays"].items():
+            start = base + offset
+            col[field] = view[start:start + 8 * count].cast(CACHE_FIELDS[field])
+        columns[key] = col
+    return columns, header["n"], header["data_keys"]
+
+
+def _cache_header(mm):
+    """Parse and check a mapped cache file's header; returns ``(header, data offset)``.
+
+    Raises ValueError (or KeyError, TypeError or AttributeError for a
+    malformed header) rather than letting a damaged file be mapped.
+    """
+    magic = len(CACHE_MAGIC)
+    if len(mm) < magic + 8 or mm[:magic] != CACHE_MAGIC:
+        raise ValueError("not a column cache file")
+    base = magic + 8 + int.from_bytes(mm[magic:magic + 8], "little")
+    if base > len(mm):
+        raise ValueError("truncated header")
+    header = json.loads(mm[magic + 8:base])
+    if header["version"] != CACHE_VERSION or header["byteorder"] != sys.byteorder:
+        raise ValueError("another cache layout")
+
+    n = header["n"]
+    for entry in header["columns"].values():
+        lengths = {}
+        for field, (offset, count) in entry["arrays"].items():
+            if field not in CACHE_FIELDS or offset < 0 or offset % 8 or count < 0 \
+                    or base + offset + 8 * count > len(mm):
+                raise ValueError("array outside the file")
+            lengths[field] = count
+        rows = [lengths[f] for f in ("null_rows", "sent_rows", "rows")]
+        if entry["n"] != n or sum(rows) > n \
+                or lengths.get("values", rows[2]) != rows[2] or lengths.get("codes", n) != n:
+            raise ValueError("array lengths do not match")
+    return header, base
+
+
+def materialise_columns(columns):
+    """Copy any memoryview arrays in ``columns`` into lists."""
+    return {key: {f: v.tolist() if isinstance(v, memoryview) else v for f, v in col.items()}
+            for key, col in columns.items()}
+
+
+def cached_columns(input_path, cache_dir):
+    """Decoded columns for ``input_path``, from the cache or decoded and cached now.
+
+    Returns ``(columns, n, schema, data_keys)`` with list or memoryview arrays.
+    """
+    path = cache_dir / f"{cache_key(input_path)}.cols"
+    hit = load_column_cache(path)
+    COUNTERS["column_cache_hits" if hit else "column_cache_misses"] += 1
+    if not hit and path.exists():
+        print(f"  Discarding unreadable column cache {path}; rebuilding it.")
+        path.unlink()
+    if hit:
+        columns, n, data_keys = hit
+        print(f"Mapped column cache {path} ({n:,} records; {input_path} not re-parsed).")
+    else:
+        records, _ = read_input(input_path)
+        data_keys = list(records[0].keys())
+        print(f"  Decoding columns (n={len(records)})…")
+        columns = build_columns(records, output_variables(SCHEMA, data_keys), SCHEMA)
+        n = len(records)
+        del records
+        save_column_cache(path, columns, n, data_keys)
+        print(f"  Cached decoded columns in {path} (individual-level: do not share).")
+        removed = prune_column_cache(path)
+        if removed:
+            print(f"  Removed {removed} superseded cache file{'s' if removed > 1 else ''}.")
 
-    # Filter schema to variables that actually exist in the data
-    data_keys = set(data[0].keys()) if data else set()
     schema = {k: v for k, v in SCHEMA.items() if k in data_keys}
-    print(f"  {len(schema)} schema variables matched to data columns.")
+    if hit:
+        print(f"  {len(schema)} schema variables matched to data columns.")
+    return columns, n, schema, data_keys
 
-    print(f"Aggregating (min_cell={min_cell})…")
-    whole_cohort, strata, strat_vars, supp_strata, supp_cells = aggregate(data, schema, min_cell=min_cell)
 
-    output = {
-        "meta": {
-            "created":            datetime.now(timezone.utc).isoformat(),
-            "source_file":        input_path.name,
-            "n":                  len(data),
-            "n_variables":        len(whole_cohort),
-            "strat_variables":    strat_vars,
-            "min_cell":           min_cell,
-            "suppressed_strata":  supp_strata,
-            "suppressed_cells":   supp_cells,
-            "tool":               "Generations Study — aggregate_data.py",
-        },
-        "group_labels": GROUP_LABELS,
-        "schema":        build_schema_block(schema),
-        "whole_cohort":  whole_cohort,
-        "strata":        strata,
-    }
+# ── Bootstrap confidence intervals ───────────────────────────────────────────
+#
+# With --ci every stratum gets 95% percentile-bootstrap intervals for the
+# mean and median of each numeric/integer variable and for the proportion of
+# n_total in each published category.  A replicate resamples the stratum's
+# participants with replacement, but none is built record by record:
+#
+#   * means: a batch of replicates is a (batch × participants) matrix of
+#     resampling weights, drawn once per stratum; one matrix product with the
+#     stratum's values (0 where not valid) and valid flags then gives every
+#     numeric variable's replicate sums and valid counts together;
+#   * medians: a replicate holds m* ~ Binomial(n, n_valid / n) valid values,
+#     and the k-th smallest of m* uniform picks among the sorted values is at
+#     floor(n_valid·U) with U ~ Beta(k, m*+1-k) (the next from another Beta
+#     draw), so each replicate costs one or two draws;
+#   * proportions: a category's count in a replicate is Binomial(n, count / n).
+#     Each category draws on its own, so published intervals reveal nothing
+#     about suppressed neighbours.
+#
+# Every (stratifier, stratum[, variable, statistic]) draws from its own
+# generator, seeded from the run's seed and its name, so the intervals do not
+# depend on --workers or the engine.  Resampling participants needs the
+# record-level columns, so --ci is for in-memory runs.
 
-    print(f"Writing {output_path}…")
-    with open(output_path, "w") as f:
-        json.dump(output, f, separators=(",", ":"))
+CI_LEVEL      = 0.95
+CI_REPLICATES = 1000
+CI_SEED       = 2024
+CI_BATCH      = 1 << 20     # resampling weights per batch (8 MB of float64)
 
-    size_kb = output_path.stat().st_size / 1024
-    print(f"Done. {output_path} ({size_kb:.1f} KB)")
-    print(f"  Whole-cohort stats for {len(whole_cohort)} variables.")
-    print(f"  Stratified by {len(strata)} variables.")
-    print(f"  Suppressed: {supp_strata} strata and {supp_cells} frequency cells (min_cell={min_cell}).")
+
+class BootstrapCI:
+    """Percentile-bootstrap intervals for stratum cells (needs NumPy)."""
+
+    def __init__(self, replicates=CI_REPLICATES, seed=CI_SEED):
+        try:
+            import numpy
+        except ImportError:
+            raise SystemExit("--ci needs NumPy (pip install numpy).") from None
+        self.np = numpy
+        self.replicates = replicates
+        self.seed = seed
+        self._columns = self._dense = None
+
+    @property
+    def config(self):
+        """``(replicates, seed)``, to rebuild this in a worker process."""
+        return self.replicates, self.seed
+
+    def meta(self):
+        return {"level": CI_LEVEL, "replicates": self.replicates, "seed": self.seed,
+                "method": "percentile bootstrap", "proportion_of": "n_total"}
+
+    def rng(self, *name):
+        digest = hashlib.blake2b("/".join(map(str, name)).encode("utf-8"), digest_size=8).digest()
+        return self.np.random.default_rng([self.seed, int.from_bytes(digest, "little")])
+
+    def intervals(self, replicates):
+        """Percentile interval of each column of ``replicates`` (replicates × statistics).
+
+        Replicates without a value (NaN) are left out, as are intervals with
+        none; quantiles interpolate like numpy.quantile()'s default.
+        """
+        np = self.np
+        reps = np.sort(replicates, axis=0)          # NaN sorts last
+        count = (~np.isnan(reps)).sum(axis=0)
+        cols = np.arange(reps.shape[1])
+        bounds = []
+        for q in ((1 - CI_LEVEL) / 2, (1 + CI_LEVEL) / 2):
+            pos = q * np.maximum(count - 1, 0)
+            lo = np.floor(pos).astype(np.intp)
+            hi = np.minimum(lo + 1, np.maximum(count - 1, 0))
+            bounds.append(reps[lo, cols] + (reps[hi, cols] - reps[lo, cols]) * (pos - lo))
+        return [[round(float(lo), 4), round(float(hi), 4)] if c else None
+                for lo, hi, c in zip(bounds[0], bounds[1], count)]
+
+    def annotate_strata(self, strat_out, strat_key, keys, members, kept, columns, var_keys, schema):
+        """Add intervals to the kept strata of one stratifier (see stratify())."""
+        np = self.np
+        numeric = [k for k in var_keys if schema[k].get("type", "numeric") in NUMERIC_TYPES]
+        dense = self._dense_values(columns, numeric, columns[strat_key]["n"])
+        members = np.asarray(members)
+        for si in kept:
+            gk = keys[si]
+            cells = strat_out[gk]["variables"]
+            values = dense[members == si]
+            COUNTERS["ci_strata"] += 1
+            # Replicates of every statistic in the stratum, one column each
+            targets, reps = [], []
+            means = self._means(values, self.rng(strat_key, gk))
+            for j, key in enumerate(numeric):
+                if cells[key]["n_valid"]:
+                    x = np.sort(values[:, j][~np.isnan(values[:, j])])
+                    targets += [(cells[key], "mean_ci"), (cells[key], "median_ci")]
+                    reps += [means[:, j], self._medians(x, len(values), self.rng(strat_key, gk, key, "median"))]
+            for key in var_keys:
+                n = cells[key]["n_total"]
+                for k, fc in cells[key].get("frequencies", {}).items():
+                    if not fc.get("suppressed"):
+                        targets.append((fc, "ci"))
+                        draws = self.rng(strat_key, gk, key, k).binomial(n, fc["count"] / n, self.replicates)
+                        reps.append(draws / n)
+            if targets:
+                for (cell, field), bounds in zip(targets, self.intervals(np.stack(reps, axis=1))):
+                    if bounds:
+                        cell[field] = bounds
+
+    def _dense_values(self, columns, numeric, n):
+        """``n`` records × numeric variables, NaN where a value is null or a sentinel (built once)."""
+        if self._columns is not columns:
+            np = self.np
+            dense = np.full((n, len(numeric)), np.nan)
+            for j, key in enumerate(numeric):
+                rows = np.asarray(columns[key]["rows"], dtype=np.intp)
+                dense[rows, j] = columns[key]["values"]
+            self._columns, self._dense = columns, dense
+        return self._dense
+
+    def _means(self, values, rng):
+        """Replicate means (replicates × variables) of a stratum's dense values."""
+        np = self.np
+        n, n_vars = values.shape
+        valid = ~np.isnan(values)
+        both = np.concatenate([np.where(valid, values, 0.0), valid.astype(np.float64)], axis=1)
+        out = np.empty((self.replicates, n_vars))
+        step = max(1, CI_BATCH // max(n, 1))
+        for start in range(0, self.replicates, step):
+            b = min(step, self.replicates - start)
+            # Resample b replicates of n participants; bincount turns picks into weights
+            picks = rng.integers(0, n, size=(b, n))
+            picks += (np.arange(b) * n)[:, None]
+            weights = np.bincount(picks.ravel(), minlength=b * n).reshape(b, n).astype(np.float64)
+            sums = weights @ both
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[start:start + b] = sums[:, :n_vars] / sums[:, n_vars:]
+        return out
+
+    def _medians(self, x, n, rng):
+        """Replicate medians of sorted valid values ``x`` in a stratum of ``n`` participants."""
+        # quantile(x, 0.5) is the k-th smallest value for odd m, else the mean
+        # of the k-th and (k+1)-th, with k = (m + 1) // 2
+        np = self.np
+        m = len(x)
+        m_star = rng.binomial(n, m / n, self.replicates)
+        k = (m_star + 1) // 2
+        u = rng.beta(np.maximum(k, 1), np.maximum(m_star + 1 - k, 1))
+        v = u + (1 - u) * rng.beta(1, np.maximum(m_star - k, 1))
+
+        def at(w):
+            return x[np.minimum(np.floor(m * w), m - 1).astype(np.intp)]
+        medians = np.where(m_star % 2 == 1, at(u), (at(u) + at(v)) / 2)
+        medians[m_star == 0] = np.nan
+        return medians
+
+
+# ── Main aggregation ─────────────────────────────────────────────────────────
+
+def find_strat_vars(schema, data_keys):
+    """Stratification variables: categorical/binary with codes, not id group."""
+    return [
+        k for k, s in schema.items()
+        if s.get("type") in CODED_TYPES
+        and s.get("codes")
+        and s.get("group") != "id"
+        and k in data_keys
+    ]
+
+
+def count_suppressed(var_stats):
+    """Number of suppressed frequency cells in one variable block."""
+    return sum(1 for fc in var_stats.get("frequencies", {}).values() if fc.get("suppressed"))
+
+
+def column_bins(columns, var_keys, schema):
+    """``{key: layout}`` of shared histogram bins for each numeric variable with values."""
+    bins = {}
+    for key in var_keys:
+        vtype = schema[key].get("type", "numeric")
+        if vtype in NUMERIC_TYPES:
+            layout = shared_bins(vtype, columns[key]["values"])
+            if layout:
+                bins[key] = layout
+    return bins
+
+
+def aggregate_cohort(columns, var_keys, schema, min_cell=5, engine=None, bins=None):
+    """Whole-cohort stats for every aggregated variable.
+
+    Histogram bin suppression (min_cell) applies but frequency suppression
+    does not (whole-cohort counts are large; strata get full suppression).
+    """
+    engine = engine or PYTHON_ENGINE
+    bins = column_bins(columns, var_keys, schema) if bins is None else bins
+    whole_cohort = {}
+    for key in var_keys:
+        s = schema[key]
+        col = columns[key]
+        n_null, n_sent, n_valid, valid = engine.column_cells(col)
+        COUNTERS["column_splits"] += 1
+        whole_cohort[key] = summarise(s.get("type", "numeric"), s.get("codes"), col["n"],
+                                      n_null[0], n_sent[0], n_valid[0], valid[0], min_cell, engine,
+                                      bins.get(key))
+    return whole_cohort
+
+
+def stratify(strat_key, columns, var_keys, schema, min_cell=5, engine=None, bins=None, ci=None):
+    """Stratified stats for one stratification variable.
+
+    Returns ``(strata_block, suppressed_strata, suppressed_cells)``.  Numeric
+    histograms are binned against the whole-cohort ``bins`` (computed from
+    ``columns`` when not given).  With ``ci`` (a BootstrapCI) each cell also
+    gets confidence intervals.
+    """
+    engine = engine or PYTHON_ENGINE
+    bins = column_bins(columns, var_keys, schema) if bins is None else bins
+    suppressed_strata = 0
+    suppressed_cells  = 0
+    codes = schema[strat_key].get("codes", {})
+
+    keys, members, sizes = engine.strata_index(columns[strat_key])
+
+    # Suppress entire strata that are too small
+    strat_out = {}
+    kept = []
+    for si, gk in enumerate(keys):
+        label = code_label(gk, codes)
+        if min_cell > 0 and sizes[si] < min_cell:
+            strat_out[gk] = {"label": label, "n": None, "suppressed": True}
+            suppressed_strata += 1
+        else:
+            strat_out[gk] = {"label": label, "n": sizes[si], "variables": {}}
+            kept.append(si)
+
+    for key in var_keys:
+        s = schema[key]
+        vtype = s.get("type", "numeric")
+        n_null, n_sent, n_valid, valid = engine.column_cells(columns[key], members, len(keys))
+        COUNTERS["column_splits"] += 1
+        for si in kept:
+            var_stats = summarise(vtype, s.get("codes"), sizes[si], n_null[si], n_sent[si],
+                                  n_valid[si], valid[si], min_cell, engine, bins.get(key))
+            suppressed_cells += count_suppressed(var_stats)
+            strat_out[keys[si]]["variables"][key] = var_stats
+
+    if ci:
+        ci.annotate_strata(strat_out, strat_key, keys, members, kept, columns, var_keys, schema)
+    return strat_out, suppressed_strata, suppressed_cells
+
+
+# Worker processes read the decoded columns from here rather than receiving
+# them with every task.  Under the "fork" start method the pool's initargs
+# are inherited by the children, so the columns are never pickled at all.
+_WORKER = {}
+
+
+def _init_worker(columns, var_keys, schema, min_cell, engine_name, bins, ci_config):
+    _WORKER.update(columns=columns, var_keys=var_keys, schema=schema, min_cell=min_cell,
+                   engine=get_engine(engine_name), bins=bins,
+                   ci=ci_config and BootstrapCI(*ci_config))
+
+
+def _worker_task(strat_key):
+    """Run one task; returns ``(result, seconds, memory_sample, counter_deltas)``."""
+    w = _WORKER
+    args = (w["columns"], w["var_keys"], w["schema"], w["min_cell"], w["engine"], w["bins"])
+    before, start = COUNTERS.copy(), time.perf_counter()
+    result = aggregate_cohort(*args) if strat_key is None else stratify(strat_key, *args, w["ci"])
+    return result, time.perf_counter() - start, memory_sample(), COUNTERS - before
+
+
+def aggregate(data, schema, min_cell=5, workers=1, engine=None, profile=NO_PROFILE, ci=None):
+    """Produce the full aggregated output dict.
+
+    With ``workers`` > 1 the whole cohort and each stratification variable
+    are aggregated in a process pool; results are collected in task order, so
+    the output does not depend on the number of workers.  ``engine`` selects
+    the statistics backend (see get_engine()); ``profile`` (see RunProfile)
+    times each phase; ``ci`` (a BootstrapCI) adds confidence intervals to
+    every stratum cell.
+
+    Returns ``(whole_cohort, strata, strat_vars, suppressed_strata,
+    suppressed_cells, bins)``, ``bins`` being the shared histogram layouts.
+    """
+    engine = engine or PYTHON_ENGINE
+
+    print(f"  Decoding columns (n={len(data)})…")
+    with profile.phase("decode"):
+        columns = engine.build_columns(data, output_variables(schema, data[0]), schema)
+    return aggregate_columns(columns, len(data), data[0].keys(), schema, min_cell, workers, engine,
+                             profile, ci)
+
+
+def aggregate_columns(columns, n, data_keys, schema, min_cell=5, workers=1, engine=None,
+                      profile=NO_PROFILE, ci=None):
+    """aggregate() over already-decoded columns (from build_columns() or the column cache).
+
+    ``data_keys`` are the input's field names and ``n`` its number of records.
+    """
+    engine = engine or PYTHON_ENGINE
+
+    suppressed_strata = 0
+    suppressed_cells  = 0
+
+    strat_vars = find_strat_vars(schema, data_keys)
+    var_keys   = output_variables(schema, data_keys)
+    bins       = column_bins(columns, var_keys, schema)
+
+    strata_out = {}
+    if workers > 1:
+        print(f"  Aggregating whole cohort and {len(strat_vars)} stratifiers on {workers} workers…")
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        if "fork" not in methods:
+            # Views of a memory-mapped cache cannot be pickled
+            columns = materialise_columns(columns)
+        # Keep the collector from touching (and so copying) the inherited columns
+        gc.freeze()
+        try:
+            with profile.phase(f"pool ({workers} workers)"), \
+                    ctx.Pool(workers, initializer=_init_worker,
+                             initargs=(columns, var_keys, schema, min_cell, engine.name, bins,
+                                       ci and ci.config)) as pool:
+                results = pool.imap(_worker_task, [None] + strat_vars)
+                for strat_key, (result, seconds, memory, counts) in zip([None] + strat_vars, results):
+                    COUNTERS.update(counts)
+                    if strat_key is None:
+                        profile.add_phase("whole_cohort", seconds, memory, worker=True)
+                        whole_cohort = result
+                        continue
+                    profile.add_phase(f"stratify:{strat_key}", seconds, memory, worker=True)
+                    strat_out, n_strata, n_cells = result
+                    print(f"  Stratified by {strat_key}.")
+                    strata_out[strat_key] = strat_out
+                    suppressed_strata += n_strata
+                    suppressed_cells  += n_cells
+        finally:
+            gc.unfreeze()
+    else:
+        print(f"  Aggregating whole cohort (n={n})…")
+        with profile.phase("whole_cohort"):
+            whole_cohort = aggregate_cohort(columns, var_keys, schema, min_cell, engine, bins)
+
+        # Build stratified stats for every stratification variable
+        for strat_key in strat_vars:
+            print(f"  Stratifying by {strat_key}…")
+            with profile.phase(f"stratify:{strat_key}"):
+                strat_out, n_strata, n_cells = stratify(strat_key, columns, var_keys, schema, min_cell,
+                                                        engine, bins, ci)
+            strata_out[strat_key] = strat_out
+            suppressed_strata += n_strata
+            suppressed_cells  += n_cells
+
+    print(f"  Suppression (min_cell={min_cell}): {suppressed_strata} strata suppressed, "
+          f"{suppressed_cells} frequency cells suppressed.")
+
+    return whole_cohort, strata_out, strat_vars, suppressed_strata, suppressed_cells, bins
+
+
+# ── Two-way cross-stratification ─────────────────────────────────────────────
+#
+# With --cross, each record's stratum in every stratification variable is
+# counted into a sparse count cube, ``{(stratum in var 1, …): n}`` with -1
+# for null.  The cube has one entry per combination that occurs (far fewer
+# than records) and every two-way table is a marginal of it: for a pair
+# (A, B), the size of each (a, b) cell and the frequencies of every other
+# stratification variable within it.  Numeric variables are split by cell
+# directly from their columns (the cube holds only strata), and each cell gets
+# their counts and summary statistics, without a histogram.
+#
+# Row and column totals of these tables are published elsewhere (the one-way
+# strata, n_valid), so a table line with a single suppressed cell could be
+# recovered by subtraction.  After min-cell suppression,
+# complementary_suppression() therefore hides further cells until no line
+# has exactly one suppressed cell.  Within a cell, a frequency table whose
+# only category is suppressed cannot be protected that way (n_valid gives it
+# away), so the variable's whole block is suppressed there instead.  A
+# numeric variable's block is suppressed where it has fewer than min-cell
+# valid values, again completed by complementary suppression over its
+# (a, b) table of n_valid, since a row's mean and n_valid would otherwise
+# give away the one hidden cell's mean.
+
+CROSS_PAIRS = [("R0_Menopause", "R0_HRTStatus"), ("R0_SmokingStatus", "R0_AlcoholStatus")]
+
+
+def parse_cross_pairs(spec):
+    """``"A:B,C:D"`` → ``[("A", "B"), ("C", "D")]``."""
+    pairs = []
+    for item in spec.split(","):
+        a, sep, b = item.strip().partition(":")
+        if not (a and sep and b) or a == b:
+            raise ValueError(f"bad cross pair {item!r} (expected VAR:VAR)")
+        pairs.append((a, b))
+    return pairs
+
+
+def check_cross_pairs(pairs, strat_vars):
+    for pair in pairs:
+        for key in pair:
+            if key not in strat_vars:
+                raise ValueError(f"--cross: {key} is not a stratification variable of this input")
+
+
+def complementary_suppression(counts, suppressed):
+    """Extend ``suppressed`` until no line of the table has exactly one suppressed cell.
+
+    ``counts`` maps cell tuples (one coordinate per dimension) to counts;
+    a line is the cells that differ in one coordinate only.  The smallest
+    non-zero published cell of a line is added each time.  Returns the
+    number of cells added.
+    """
+    if not counts:
+        return 0
+    lines = []
+    for axis in range(len(next(iter(counts)))):
+        groups = {}
+        for cell in counts:
+            groups.setdefault(cell[:axis] + cell[axis + 1:], []).append(cell)
+        lines.extend(groups.values())
+
+    added, changed = 0, True
+    while changed:
+        changed = False
+        for line in lines:
+            if sum(cell in suppressed for cell in line) != 1:
+                continue
+            candidates = [cell for cell in line if cell not in suppressed and counts[cell]]
+            if candidates:
+                suppressed.add(min(candidates, key=counts.__getitem__))
+                added += 1
+                changed = True
+    return added
+
+
+def cross_stratify(columns, strat_vars, schema, pairs, min_cell=5, engine=None):
+    """Two-way stratified summaries for each ``(A, B)`` in ``pairs``.
+
+    Returns ``(strata2d, suppressed_cells, complementary_cells)``.
+    ``strata2d`` maps ``"A:B"`` to a block holding the row and column labels,
+    the summarised ``variables`` (the other stratification variables, then
+    the numeric ones) and ``cells[a][b]``: ``{"n", "variables"}``, or
+    ``{"n": None, "suppressed": True}`` for a hidden cell.  Cells that occur
+    in no record are left out.
+    """
+    engine = engine or PYTHON_ENGINE
+    check_cross_pairs(pairs, strat_vars)
+
+    index = {}
+    for key in strat_vars:
+        keys, members, _ = engine.strata_index(columns[key])
+        sentinel = {int(members[i]) for i in columns[key]["sent_rows"]}
+        index[key] = (keys, members, sentinel)
+    cube = engine.count_cube([index[key][1] for key in strat_vars])
+    COUNTERS["record_scans"] += 1
+    pos = {key: i for i, key in enumerate(strat_vars)}
+    numeric = [key for key, col in columns.items() if col["type"] in NUMERIC_TYPES]
+
+    strata2d, n_suppressed, n_complementary = {}, 0, 0
+    for a_key, b_key in pairs:
+        ia, ib = pos[a_key], pos[b_key]
+        others = [k for k in strat_vars if k not in (a_key, b_key)]
+
+        # Marginals: cell sizes, then per other variable {cell: {stratum: n}}
+        sizes, values = {}, {k: {} for k in others}
+        for combo, cnt in cube.items():
+            cell = combo[ia], combo[ib]
+            if cell[0] < 0 or cell[1] < 0:
+                continue
+            sizes[cell] = sizes.get(cell, 0) + cnt
+            for k in others:
+                t = values[k].setdefault(cell, {})
+                v = combo[pos[k]]
+                t[v] = t.get(v, 0) + cnt
+
+        hidden = {cell for cell, cnt in sizes.items() if min_cell > 0 and cnt < min_cell}
+        n_suppressed += len(hidden)
+        n_complementary += complementary_suppression(sizes, hidden)
+
+        # Frequencies within cells form an (a, b, value) table; everything in
+        # a hidden cell counts as suppressed there
+        freq_hidden = {}
+        for k in others:
+            keys, _, sentinel = index[k]
+            counts = {cell + (v,): cnt for cell, t in values[k].items()
+                      for v, cnt in t.items() if v >= 0 and v not in sentinel}
+            supp = {c for c, cnt in counts.items()
+                    if c[:2] in hidden or (min_cell > 0 and cnt < min_cell)}
+            n_suppressed += sum(1 for c in supp if c[:2] not in hidden)
+            n_complementary += complementary_suppression(counts, supp)
+            freq_hidden[k] = supp
+
+        # Numeric variables, split by cell number a * n_b + b
+        a_keys, b_keys = index[a_key][0], index[b_key][0]
+        n_b = len(b_keys)
+        members = engine.pair_members(index[a_key][1], index[b_key][1], n_b)
+        num_cells, num_hidden = {}, {}
+        for k in numeric:
+            split = engine.column_cells(columns[k], members, len(a_keys) * n_b)
+            COUNTERS["column_splits"] += 1
+            num_cells[k] = {cell: [part[cell[0] * n_b + cell[1]] for part in split] for cell in sizes}
+            n_valid = {cell: parts[2] for cell, parts in num_cells[k].items()}
+            supp = {cell for cell, nv in n_valid.items()
+                    if cell in hidden or (min_cell > 0 and 0 < nv < min_cell)}
+            n_suppressed += len(supp - hidden)
+            n_complementary += complementary_suppression(n_valid, supp)
+            num_hidden[k] = supp
+
+        cells = {}
+        for (a, b), n in sorted(sizes.items()):
+            row = cells.setdefault(a_keys[a], {})
+            if (a, b) in hidden:
+                row[b_keys[b]] = {"n": None, "suppressed": True}
+                continue
+            var_stats = {}
+            for k in others:
+                keys, _, sentinel = index[k]
+                t = values[k][a, b]
+                valid = {keys[v]: cnt for v, cnt in t.items() if v >= 0 and v not in sentinel}
+                stats = summarise(schema[k].get("type"), schema[k].get("codes"), n, t.get(-1, 0),
+                                  sum(t.get(v, 0) for v in sentinel), sum(valid.values()), valid,
+                                  engine=engine)
+                hide = [keys[v] for v in t if (a, b, v) in freq_hidden[k]]
+                if hide and len(valid) == 1:
+                    stats = {"suppressed": True}
+                    n_complementary += 1
+                else:
+                    for fk in hide:
+                        stats["frequencies"][fk].update(count=None, suppressed=True)
+                var_stats[k] = stats
+            for k in numeric:
+                if (a, b) in num_hidden[k]:
+                    var_stats[k] = {"suppressed": True}
+                    continue
+                n_null, n_sent, n_valid, valid = num_cells[k][a, b]
+                stats = {"n_total": n, "n_valid": n_valid, "n_null": n_null, "n_sentinel": n_sent}
+                if n_valid:
+                    stats.update(engine.sorted_stats(valid))
+                var_stats[k] = stats
+            row[b_keys[b]] = {"n": n, "variables": var_stats}
+
+        a_codes, b_codes = schema[a_key].get("codes", {}), schema[b_key].get("codes", {})
+        strata2d[f"{a_key}:{b_key}"] = {
+            "row_var":    a_key,
+            "col_var":    b_key,
+            "row_labels": {k: code_label(k, a_codes) for k in a_keys},
+            "col_labels": {k: code_label(k, b_codes) for k in b_keys},
+            "variables":  others + numeric,
+            "cells":      cells,
+        }
+
+    print(f"  Cross-stratification (min_cell={min_cell}): {n_suppressed} cells suppressed, "
+          f"{n_complementary} more by complementary suppression.")
+    return strata2d, n_suppressed, n_complementary
+
+
+# ── Streaming aggregation ────────────────────────────────────────────────────
+#
+# For inputs too large to hold as a list of dicts, records are read one at a
+# time and folded, a chunk at a time, into exact running tallies: for every
+# variable (whole cohort and each stratum of each stratifier) the null,
+# sentinel and valid counts plus a value→count map.  The statistics derived
+# from the tallies are identical to aggregate()'s.
+#
+# Memory is one chunk of records plus the tallies, and the tallies are not
+# bounded: they are exact, one map entry per distinct value per cell.  Coded
+# variables and coarse integers have a handful of values, but a continuous
+# measurement has about one per participant, so each such variable costs up to
+# participants × (1 + stratification variables) entries.  For the built-in
+# schema that is a few hundred entries per participant, which can exceed the
+# parsed records themselves; --stream bounds the JSON decoding, not the
+# exact quantile state.
+
+STREAM_CHUNK = 10_000
+
+_ARRAY_SEP = re.compile(r"[\s,]*")
+
+
+def iter_records(path, chunk_size=1 << 16):
+    """Yield records one at a time from a JSON array or NDJSON file."""
+    with open(path) as f:
+        first = f.read(chunk_size).lstrip()[:1]
+        f.seek(0)
+        if first == "{":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif first == "[":
+            yield from _iter_json_array(f, chunk_size)
+        else:
+            raise ValueError("Input must be a JSON array of records (or NDJSON).")
+
+
+def _iter_json_array(f, chunk_size):
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size)
+    pos = buf.index("[") + 1
+    eof = False
+    while True:
+        pos = _ARRAY_SEP.match(buf, pos).end()
+        if pos < len(buf):
+            if buf[pos] == "]":
+                return
+            try:
+                rec, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Most likely a record split across reads; only fatal at EOF
+                if eof:
+                    raise
+            else:
+                yield rec
+                continue
+        elif eof:
+            raise ValueError("Unterminated JSON array of records.")
+        more = f.read(chunk_size)
+        eof = not more
+        buf, pos = buf[pos:] + more, 0
+
+
+def new_tally():
+    """Running tallies for one variable within one cell (cohort or stratum).
+
+    ``values`` holds one entry per distinct value seen, so it grows with the
+    participants in the cell for a continuous variable (see above).
+    """
+    return {"n_null": 0, "n_sentinel": 0, "n_valid": 0, "values": Counter()}
+
+
+def new_state(var_keys, strat_vars):
+    """Empty running state for the given aggregated and stratification variables."""
+    return {
+        "n":          0,
+        "strat_vars": list(strat_vars),
+        "whole":      {k: new_tally() for k in var_keys},
+        "strata":     {k: {} for k in strat_vars},
+    }
+
+
+def _fold_cells(tallies, cells):
+    for tally, n_null, n_sent, n_valid, valid in zip(tallies, *cells):
+        tally["n_null"]     += n_null
+        tally["n_sentinel"] += n_sent
+        tally["n_valid"]    += n_valid
+        if valid:
+            tally["values"].update(valid)
+
+
+def fold_records(state, records, schema):
+    """Add a list of records to ``state`` via the columnar engine.
+
+    Each record adds at most one value-map entry per aggregated variable to
+    the whole cohort and to its stratum of every stratifier, so the state
+    grows by up to ``len(records) × variables × (1 + stratifiers)`` entries
+    (fewer where values repeat, as coded and integer ones do).
+    """
+    var_keys = list(state["whole"])
+    columns  = build_columns(records, var_keys, schema)
+    state["n"] += len(records)
+
+    for key in var_keys:
+        _fold_cells([state["whole"][key]], column_cells(columns[key]))
+
+    for strat_key in state["strat_vars"]:
+        keys, members, sizes = strata_index(columns[strat_key])
+        groups = state["strata"][strat_key]
+        grps = []
+        for gk, size in zip(keys, sizes):
+            g = groups.get(gk)
+            if g is None:
+                g = groups[gk] = {"n": 0, "variables": {k: new_tally() for k in var_keys}}
+            g["n"] += size
+            grps.append(g)
+        for key in var_keys:
+            _fold_cells([g["variables"][key] for g in grps],
+                        column_cells(columns[key], members, len(keys)))
+
+
+def tally_summary(schema_entry, n_total, tally, min_cell=0, bins=None):
+    """summarise() for a running tally."""
+    vtype  = schema_entry.get("type", "numeric")
+    values = tally["values"]
+    valid  = SortedCounts(values) if vtype in NUMERIC_TYPES else values
+    return summarise(vtype, schema_entry.get("codes"), n_total, tally["n_null"],
+                     tally["n_sentinel"], tally["n_valid"], valid, min_cell, bins=bins)
+
+
+def finalise_state(state, schema, min_cell=5):
+    """Turn running state into the same tuple aggregate() returns."""
+    suppressed_strata = 0
+    suppressed_cells  = 0
+
+    bins = {}
+    for key, t in state["whole"].items():
+        vtype = schema[key].get("type", "numeric")
+        if vtype in NUMERIC_TYPES:
+            layout = shared_bins(vtype, SortedCounts(t["values"]))
+            if layout:
+                bins[key] = layout
+
+    whole_cohort = {key: tally_summary(schema[key], state["n"], t, min_cell, bins.get(key))
+                    for key, t in state["whole"].items()}
+
+    strata_out = {}
+    for strat_key in state["strat_vars"]:
+        codes  = schema[strat_key].get("codes", {})
+        groups = state["strata"][strat_key]
+        strat_out = {}
+        for gk in sorted(groups):
+            g, label = groups[gk], code_label(gk, codes)
+            if min_cell > 0 and g["n"] < min_cell:
+                strat_out[gk] = {"label": label, "n": None, "suppressed": True}
+                suppressed_strata += 1
+                continue
+            grp_stats = {"label": label, "n": g["n"], "variables": {}}
+            for key, t in g["variables"].items():
+                var_stats = tally_summary(schema[key], g["n"], t, min_cell, bins.get(key))
+                suppressed_cells += count_suppressed(var_stats)
+                grp_stats["variables"][key] = var_stats
+            strat_out[gk] = grp_stats
+        strata_out[strat_key] = strat_out
+
+    return whole_cohort, strata_out, list(state["strat_vars"]), suppressed_strata, suppressed_cells, bins
+
+
+def fold_stream(state, records, schema, chunk_size=STREAM_CHUNK, progress=True):
+    """Fold an iterable of records into ``state``, one chunk at a time; returns how many."""
+    records = iter(records)
+    n = 0
+    for chunk in iter(lambda: list(islice(records, chunk_size)), []):
+        fold_records(state, chunk, schema)
+        n += len(chunk)
+        if progress:
+            print(f"  {state['n']:,} records folded…")
+    return n
+
+
+def state_from_records(records, schema, chunk_size=STREAM_CHUNK, progress=True):
+    """Fold an iterable of records into a new running state, one chunk at a time."""
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        raise ValueError("Input contains no records.")
+    state = new_state(output_variables(schema, first), find_strat_vars(schema, first))
+    state["schema_keys"] = list(schema)
+    fold_stream(state, chain([first], records), schema, chunk_size, progress)
+    return state
+
+
+def aggregate_stream(records, schema, min_cell=5, chunk_size=STREAM_CHUNK, profile=NO_PROFILE):
+    """aggregate() over an iterable of records, holding one chunk at a time.
+
+    Returns aggregate()'s tuple plus the number of records read.
+    """
+    with profile.phase("load_fold"):
+        state = state_from_records(records, schema, chunk_size)
+    print(f"  Summarising {len(state['strat_vars'])} stratifiers (n={state['n']})…")
+    with profile.phase("finalise"):
+        result = finalise_state(state, schema, min_cell)
+    print(f"  Suppression (min_cell={min_cell}): {result[3]} strata suppressed, "
+          f"{result[4]} frequency cells suppressed.")
+    return result + (state["n"],)
+
+
+# ── Partial-aggregate state files ────────────────────────────────────────────
+#
+# A running state can be written to disk, so that shards of the cohort (for
+# example one per recruitment site) are aggregated independently and merged
+# later.  Every tally is exact — counts, and a value→count map from which
+# moments and quantiles are recomputed in full — so a merged state yields
+# exactly the statistics of a single run over the concatenated input, with
+# no quantile error bound to carry.  Frequency ties keep first-seen order, so
+# merging shards in input order also reproduces the single-run ordering.
+#
+# State files are NOT shareable: they are unsuppressed and the value maps
+# can single out individuals.  Min-cell suppression is applied only when the
+# merged state is finalised.
+
+STATE_FORMAT  = "generations-aggregate-state"
+STATE_VERSION = 1
+
+
+def _tally_to_json(tally):
+    return {"n_null": tally["n_null"], "n_sentinel": tally["n_sentinel"],
+            "n_valid": tally["n_valid"], "values": [[v, c] for v, c in tally["values"].items()]}
+
+
+def _tally_from_json(obj):
+    return {"n_null": obj["n_null"], "n_sentinel": obj["n_sentinel"],
+            "n_valid": obj["n_valid"], "values": Counter(dict((v, c) for v, c in obj["values"]))}
+
+
+def state_to_json(state):
+    """JSON-safe form of a running state (value maps become [value, count] pairs)."""
+    return {
+        "format":       STATE_FORMAT,
+        "version":      STATE_VERSION,
+        "source_files": state.get("source_files", []),
+        **{k: state[k] for k in ("input", "batches") if k in state},
+        "schema_keys":  state["schema_keys"],
+        "n":            state["n"],
+        "strat_vars":   state["strat_vars"],
+        "whole":        {k: _tally_to_json(t) for k, t in state["whole"].items()},
+        "strata": {
+            sk: {gk: {"n": g["n"], "variables": {k: _tally_to_json(t) for k, t in g["variables"].items()}}
+                 for gk, g in groups.items()}
+            for sk, groups in state["strata"].items()
+        },
+    }
+
+
+def state_from_json(obj):
+    """Inverse of state_to_json(); rejects files of another format or version."""
+    if obj.get("format") != STATE_FORMAT or obj.get("version") != STATE_VERSION:
+        raise ValueError(f"Not a version-{STATE_VERSION} {STATE_FORMAT} file.")
+    return {
+        "source_files": obj["source_files"],
+        **{k: obj[k] for k in ("input", "batches") if k in obj},
+        "schema_keys":  obj["schema_keys"],
+        "n":            obj["n"],
+        "strat_vars":   obj["strat_vars"],
+        "whole":        {k: _tally_from_json(t) for k, t in obj["whole"].items()},
+        "strata": {
+            sk: {gk: {"n": g["n"], "variables": {k: _tally_from_json(t) for k, t in g["variables"].items()}}
+                 for gk, g in groups.items()}
+            for sk, groups in obj["strata"].items()
+        },
+    }
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """Suspend the cyclic collector while building millions of small acyclic containers.
+
+    A state holds one [value, count] pair per distinct value per stratum; left
+    on, the collector rescans the growing heap over and over while they are made.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def save_state(state, path):
+    """Write a state file privately (mode 0600), replacing any old one only once complete."""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with gc_paused():
+        # dumps() encodes in one pass; dump() would issue a write per token
+        text = json.dumps(state_to_json(state), separators=(",", ":"))
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def load_state(path):
+    with open(path) as f, gc_paused():
+        return state_from_json(json.load(f))
+
+
+def state_schema(state):
+    """The SCHEMA entries ``state`` was folded under.
+
+    Raises ValueError if the state names variables SCHEMA no longer has, as
+    when it was written by an older version of this script.
+    """
+    unknown = [k for k in state["schema_keys"] if k not in SCHEMA]
+    if unknown:
+        raise ValueError(f"written under a different SCHEMA (no longer has {', '.join(unknown)})")
+    return {k: SCHEMA[k] for k in state["schema_keys"]}
+
+
+def _merge_tally(into, tally):
+    into["n_null"]     += tally["n_null"]
+    into["n_sentinel"] += tally["n_sentinel"]
+    into["n_valid"]    += tally["n_valid"]
+    into["values"].update(tally["values"])
+
+
+def merge_state(into, other):
+    """Fold running state ``other`` into ``into`` (in place) and return ``into``."""
+    for field in ("schema_keys", "strat_vars"):
+        if into[field] != other[field]:
+            raise ValueError(f"Cannot merge states with different {field}.")
+    if list(into["whole"]) != list(other["whole"]):
+        raise ValueError("Cannot merge states with different aggregated variables.")
+
+    into["n"] += other["n"]
+    into["source_files"] = into.get("source_files", []) + other.get("source_files", [])
+    for key, t in other["whole"].items():
+        _merge_tally(into["whole"][key], t)
+    for strat_key, groups in other["strata"].items():
+        mine = into["strata"][strat_key]
+        for gk, g in groups.items():
+            if gk not in mine:
+                mine[gk] = {"n": 0, "variables": {k: new_tally() for k in into["whole"]}}
+            mine[gk]["n"] += g["n"]
+            for key, t in g["variables"].items():
+                _merge_tally(mine[gk]["variables"][key], t)
+    return into
+
+
+# ── Incremental appends ──────────────────────────────────────────────────────
+#
+# ``--append batch.json`` folds a new batch of records into the state of
+# everything aggregated so far and regenerates the output from it.  The
+# state lives beside the input as ``<input stem>.state`` — individual-level,
+# so mode 0600 and never shared.  It is built from the input on the first
+# append, and records the input's size and mtime, to notice a re-extracted
+# input, plus each batch's SHA-256, so that a batch cannot be folded in twice.
+#
+# An update costs time in proportion to the batch, not to the cohort.  Each
+# numeric cell (a variable in the whole cohort or in one stratum) keeps its
+# distinct values ascending with their counts, the exact sum of its values
+# and of their squares, its histogram counts against the shared bins and its
+# summary.  A batch's values are merged in one by one, and only the cells it
+# touched are summarised again: quantiles are located in the merged arrays,
+# the mean and SD come from the exact sums.  Histogram counts are updated in
+# place unless the batch moves the cohort's minimum or maximum, when that
+# variable is re-binned from its arrays.  Medians, quartiles, means and
+# histograms come out exactly as from a full run; an SD, taken from the
+# exact sums rather than from a second pass over the values, can differ
+# from the full run's in the last bit, far below the four decimals published.
+#
+# The file is laid out like the column cache: a magic line, an 8-byte header
+# length, a JSON header with everything but the numeric cells' values, then
+# each of those cells' float64 values and int64 counts.  Loading maps the
+# file, so cells a batch does not touch are only copied through on saving.
+
+APPEND_MAGIC   = b"GSAPPEND\n"
+APPEND_VERSION = 1
+APPEND_SCALARS = ("n_null", "n_sentinel", "n_valid", "bins", "stats")
+
+
+def append_state_path(input_path):
+    return input_path.with_name(f"{input_path.stem}.state")
+
+
+def file_fingerprint(path):
+    st = path.stat()
+    return {"file": path.name, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ExactSum:
+    """A running sum of floats held exactly, as ``mantissa · 2**exponent``.
+
+    ``float()`` of it is correctly rounded, like math.fsum() of the same values.
+    """
+
+    __slots__ = ("mantissa", "exponent")
+
+    def __init__(self, mantissa=0, exponent=0):
+        self.mantissa, self.exponent = mantissa, exponent
+
+    def add(self, num, den, count=1):
+        """Add ``count`` times ``num / den``, where ``den`` is a power of two."""
+        exp = 1 - den.bit_length()
+        if exp < self.exponent:
+            self.mantissa <<= self.exponent - exp
+            self.exponent = exp
+        self.mantissa += (num * count) << (exp - self.exponent)
+
+    def add_all(self, ratios):
+        """add() each ``(num, den, count)`` in ``ratios``, over their common denominator."""
+        if ratios:
+            bits = max(den.bit_length() for _, den, _ in ratios)
+            total = sum((num * count) << (bits - den.bit_length()) for num, den, count in ratios)
+            self.add(total, 1 << (bits - 1))
+
+    def __float__(self):
+        if self.exponent >= 0:
+            return float(self.mantissa << self.exponent)
+        return self.mantissa / (1 << -self.exponent)
+
+
+def squared_deviations(total, squares, n, mean):
+    """Σ(x − mean)², correctly rounded, for ``n`` values with exact sums ``total`` and ``squares``."""
+    num, den = mean.as_integer_ratio()
+    dev = ExactSum(squares.mantissa, squares.exponent)
+    dev.add(-2 * num * total.mantissa, den << -total.exponent)
+    dev.add(n * num * num, den * den)
+    return float(dev)
+
+
+def new_cell(schema_entry):
+    """An empty append-state cell: a numeric one (see above) or a running tally."""
+    if schema_entry.get("type", "numeric") not in NUMERIC_TYPES:
+        return new_tally()
+    return {"n_null": 0, "n_sentinel": 0, "n_valid": 0, "values": array("d"), "counts": array("q"),
+            "sum": ExactSum(), "squares": ExactSum(), "bins": [], "stats": None}
+
+
+def _merge_values(cell, value_counts):
+    """Merge ``{value: count}`` into a numeric cell's arrays and sums.
+
+    Returns the merged-in values and their counts, ascending.  The arrays are
+    rebuilt from slices of the old ones, so the copying runs at memcpy speed.
+    """
+    added = sorted(value_counts.items())
+    ratios = [x.as_integer_ratio() + (c,) for x, c in added]
+    cell["sum"].add_all(ratios)
+    cell["squares"].add_all([(num * num, den * den, c) for num, den, c in ratios])
+
+    values, counts = cell["values"], cell["counts"]
+    if not values:
+        new_values, new_counts = array("d", [x for x, _ in added]), array("q", [c for _, c in added])
+    else:
+        # frombytes() takes byte views, so slices are cast to bytes
+        old_values, old_counts = memoryview(values).cast("B"), memoryview(counts).cast("B")
+        new_values, new_counts = array("d"), array("q")
+        start = 0
+        for x, c in added:
+            i = bisect_left(values, x, start)
+            new_values.frombytes(old_values[8 * start:8 * i])
+            new_counts.frombytes(old_counts[8 * start:8 * i])
+            new_values.append(x)
+            if i < len(values) and values[i] == x:
+                new_counts.append(counts[i] + c)
+                start = i + 1
+            else:
+                new_counts.append(c)
+                start = i
+        new_values.frombytes(old_values[8 * start:])
+        new_counts.frombytes(old_counts[8 * start:])
+    cell["values"], cell["counts"], cell["stats"] = new_values, new_counts, None
+    return added
+
+
+def _cell_stats(cell):
+    nums = SortedCounts.from_sorted(cell["values"], cell["counts"])
+    n = len(nums)
+    mean = float(cell["sum"]) / n
+    return stats_block(nums, mean, math.sqrt(squared_deviations(cell["sum"], cell["squares"], n, mean) / n))
+
+
+def new_append_state(base, schema):
+    """An append state holding running state ``base`` (see new_state())."""
+    state = {
+        "schema_keys": base["schema_keys"],
+        "n":           0,
+        "strat_vars":  list(base["strat_vars"]),
+        "bins":        {},
+        "whole":       {k: new_cell(schema[k]) for k in base["whole"]},
+        "strata":      {k: {} for k in base["strat_vars"]},
+    }
+    fold_into_append_state(state, base, schema)
+    return state
+
+
+def fold_into_append_state(state, batch, schema):
+    """Merge running state ``batch`` into append state ``state`` and bring its bins up to date.
+
+    Cells whose values change lose their cached summary (see refresh_stats()).
+    """
+    state["n"] += batch["n"]
+    cell_pairs = [(state["whole"], batch["whole"])]
+    for strat_key, groups in batch["strata"].items():
+        mine = state["strata"][strat_key]
+        for gk, g in groups.items():
+            if gk not in mine:
+                mine[gk] = {"n": 0, "variables": {k: new_cell(schema[k]) for k in state["whole"]}}
+            mine[gk]["n"] += g["n"]
+            cell_pairs.append((mine[gk]["variables"], g["variables"]))
+
+    added = {}
+    for cells, tallies in cell_pairs:
+        for key, tally in tallies.items():
+            cell = cells[key]
+            if "counts" not in cell:
+                _merge_tally(cell, tally)
+                continue
+            cell["n_null"]     += tally["n_null"]
+            cell["n_sentinel"] += tally["n_sentinel"]
+            cell["n_valid"]    += tally["n_valid"]
+            if tally["values"]:
+                added.setdefault(key, []).append((cell, _merge_values(cell, tally["values"])))
+
+    for key, whole in state["whole"].items():
+        if "counts" not in whole:
+            continue
+        layout = shared_bins(schema[key].get("type", "numeric"), whole["values"])
+        if layout == state["bins"].get(key):
+            # Same bins: count the new values into them
+            bin_of = layout and bin_index(layout)
+            for cell, values in added.get(key, []):
+                counts = cell["bins"] or [0] * len(layout[0])
+                for x, c in values:
+                    counts[bin_of(x)] += c
+                cell["bins"] = counts
+            continue
+        state["bins"][key] = layout
+        groups = [g for strat in state["strata"].values() for g in strat.values()]
+        for cell in [whole] + [g["variables"][key] for g in groups]:
+            cell["bins"] = bin_fill(SortedCounts.from_sorted(cell["values"], cell["counts"]), layout) \
+                if cell["values"] else []
+
+
+def refresh_stats(state):
+    """Summarise every numeric cell whose values changed since it was last summarised."""
+    groups = [g["variables"] for strat in state["strata"].values() for g in strat.values()]
+    for cells in [state["whole"]] + groups:
+        for cell in cells.values():
+            if "counts" in cell and cell["stats"] is None and cell["values"]:
+                cell["stats"] = _cell_stats(cell)
+
+
+def append_result(state, schema, min_cell=5):
+    """aggregate()'s tuple for an append state, from its cells' stored summaries.
+
+    Call refresh_stats() first; the state is summarised without suppression
+    and then suppressed by suppress_result(), as for release variants.
+    """
+    bins = {key: layout for key, layout in state["bins"].items() if layout}
+
+    def block(key, cell, n_total):
+        if "counts" not in cell:
+            return tally_summary(schema[key], n_total, cell)
+        result = {"n_total": n_total, "n_valid": cell["n_valid"], "n_null": cell["n_null"],
+                  "n_sentinel": cell["n_sentinel"]}
+        if cell["values"]:
+            result.update(cell["stats"])
+            result["histogram"] = {"counts": list(cell["bins"])}
+        else:
+            result["histogram"] = {"counts": []} if key in bins else {"labels": [], "counts": []}
+        return result
+
+    whole_cohort = {key: block(key, cell, state["n"]) for key, cell in state["whole"].items()}
+    strata_out = {}
+    for strat_key in state["strat_vars"]:
+        codes  = schema[strat_key].get("codes", {})
+        groups = state["strata"][strat_key]
+        strata_out[strat_key] = {
+            gk: {"label": code_label(gk, codes), "n": groups[gk]["n"],
+                 "variables": {key: block(key, cell, groups[gk]["n"])
+                               for key, cell in groups[gk]["variables"].items()}}
+            for gk in sorted(groups)
+        }
+    return suppress_result((whole_cohort, strata_out, list(state["strat_vars"]), 0, 0, bins), min_cell)
+
+
+def save_append_state(state, path):
+    """Write an append state privately (mode 0600), replacing any old one only once complete."""
+    blobs, offset = [], 0
+
+    def cell_header(cell):
+        nonlocal offset
+        if "counts" not in cell:
+            return _tally_to_json(cell)
+        entry = {k: cell[k] for k in APPEND_SCALARS}
+        entry["sum"]     = [cell["sum"].mantissa, cell["sum"].exponent]
+        entry["squares"] = [cell["squares"].mantissa, cell["squares"].exponent]
+        entry["values"]  = [offset, len(cell["values"])]
+        blobs.extend((cell["values"], cell["counts"]))
+        offset += 16 * len(cell["values"])
+        return entry
+
+    header = {
+        "version":      APPEND_VERSION,
+        "byteorder":    sys.byteorder,
+        **{k: state[k] for k in ("source_files", "input", "batches", "schema_keys", "n", "strat_vars", "bins")},
+        "whole":        {k: cell_header(c) for k, c in state["whole"].items()},
+        "strata": {
+            sk: {gk: {"n": g["n"], "variables": {k: cell_header(c) for k, c in g["variables"].items()}}
+                 for gk, g in groups.items()}
+            for sk, groups in state["strata"].items()
+        },
+    }
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    pad = -(len(APPEND_MAGIC) + 8 + len(head)) % 8
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(APPEND_MAGIC + (len(head) + pad).to_bytes(8, "little") + head + b" " * pad)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+def load_append_state(path):
+    """Map an append state file; raises ValueError if it is not one or is damaged."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _append_state_from(mm)
+    except (KeyError, TypeError, AttributeError) as e:       # JSONDecodeError is a ValueError
+        raise ValueError(f"malformed header ({e!r})") from None
+
+
+def _append_state_from(mm):
+    magic = len(APPEND_MAGIC)
+    if len(mm) < magic + 8 or mm[:magic] != APPEND_MAGIC:
+        raise ValueError("not an append state file")
+    base = magic + 8 + int.from_bytes(mm[magic:magic + 8], "little")
+    if base > len(mm):
+        raise ValueError("truncated header")
+    header = json.loads(mm[magic + 8:base])
+    if header["version"] != APPEND_VERSION or header["byteorder"] != sys.byteorder:
+        raise ValueError("written by another version of this script")
+    view = memoryview(mm)
+
+    def cell(entry):
+        if "sum" not in entry:
+            return _tally_from_json(entry)
+        offset, count = entry["values"]
+        start = base + offset
+        if offset < 0 or offset % 8 or count < 0 or start + 16 * count > len(mm):
+            raise ValueError("values outside the file")
+        c = {k: entry[k] for k in APPEND_SCALARS}
+        c["values"] = view[start:start + 8 * count].cast("d")
+        c["counts"] = view[start + 8 * count:start + 16 * count].cast("q")
+        c["sum"], c["squares"] = ExactSum(*entry["sum"]), ExactSum(*entry["squares"])
+        return c
+
+    state = {k: header[k] for k in ("source_files", "input", "batches", "schema_keys", "n", "strat_vars")}
+    state["bins"]   = {k: layout and tuple(layout) for k, layout in header["bins"].items()}
+    state["whole"]  = {k: cell(e) for k, e in header["whole"].items()}
+    state["strata"] = {
+        sk: {gk: {"n": g["n"], "variables": {k: cell(e) for k, e in g["variables"].items()}}
+             for gk, g in groups.items()}
+        for sk, groups in header["strata"].items()
+    }
+    return state
+
+
+def append_batches(input_path, batches, stream=False):
+    """Fold ``batches`` into the append state beside ``input_path`` and save it.
+
+    Returns ``(state, schema)``; raises ValueError if the state file cannot
+    be used.
+    """
+    path = append_state_path(input_path)
+    if path.exists():
+        try:
+            state = load_append_state(path)
+            schema = state_schema(state)
+        except ValueError as e:
+            raise ValueError(f"{path} is unusable: {e}.  Delete it and append every batch again; "
+                             f"the first append rebuilds it from {input_path.name}.") from None
+        if state["input"] != file_fingerprint(input_path):
+            raise SystemExit(f"{input_path} has changed since {path} was built from it; "
+                             f"delete {path} to rebuild it from the new input.")
+        print(f"Loaded {path} ({state['n']:,} records, {len(state['batches'])} batches appended).")
+    else:
+        print(f"No append state beside {input_path}: building {path} from it…")
+        records, schema = read_input(input_path, stream=stream)
+        base = state_from_records(records, schema,
+                                  chunk_size=STREAM_CHUNK if stream else max(len(records), 1),
+                                  progress=stream)
+        del records
+        state = new_append_state(base, schema)
+        del base
+        state.update(source_files=[input_path.name], input=file_fingerprint(input_path), batches=[])
+
+    for batch in batches:
+        digest = file_digest(batch)
+        if any(b["sha256"] == digest for b in state["batches"]):
+            raise SystemExit(f"{batch} has already been appended to {path}.")
+        records, _ = read_input(batch, stream=stream)
+        folded = new_state(list(state["whole"]), state["strat_vars"])
+        n = fold_stream(folded, records, schema, progress=stream)
+        fold_into_append_state(state, folded, schema)
+        print(f"  Appended {n:,} records from {batch.name} (cohort now {state['n']:,}).")
+        state["batches"].append({"file": batch.name, "sha256": digest, "n": n})
+        state["source_files"].append(batch.name)
+
+    refresh_stats(state)
+    print(f"Saving {path} (individual-level: do not share)…")
+    save_append_state(state, path)
+    return state, schema
+
+
+# ── Release variants ─────────────────────────────────────────────────────────
+#
+# The published variants of the aggregate differ only in their min-cell
+# threshold and in the subset of the cohort they cover.  The ``release``
+# subcommand reads the input once, folding each chunk into one running state
+# per distinct subset, finalises each state once without suppression, and
+# then derives every variant with suppress_result(), which applies min-cell
+# suppression to the unsuppressed output exactly as a direct run would.
+#
+# A release config is a JSON file:
+#
+#   {"input": "cohort.json",
+#    "releases": [
+#      {"name": "public",   "output": "aggregated_data.json", "min_cell": 5},
+#      {"name": "partners", "output": "partners/agg.json",    "min_cell": 10,
+#       "format": "compact"},
+#      {"name": "qa",       "output": "qa/agg.json",          "min_cell": 0},
+#      {"name": "white",    "output": "white/agg.json",       "min_cell": 5,
+#       "filter": {"R0_Ethnicity": [1]}}]}
+#
+# A filter keeps records whose value of every listed variable is one of the
+# listed values.  Paths are relative to the config file.
+
+RELEASE_FIELDS = {"name", "output", "min_cell", "format", "split_strata", "gzip", "filter"}
+
+
+def load_release_config(path):
+    """Read and check a release config; returns ``(input_path or None, releases)``.
+
+    Each release comes back with every field filled in and ``output`` as a
+    Path; a filter's values are normalised with value_key().
+    """
+    path = Path(path)
+    with open(path) as f:
+        config = json.load(f)
+    releases = config.get("releases") if isinstance(config, dict) else None
+    if not releases or not isinstance(releases, list):
+        raise ValueError(f"{path}: expected {{\"releases\": [...]}} with at least one release.")
+
+    out, names, outputs = [], set(), set()
+    for i, rel in enumerate(releases):
+        where = f"{path}: release {rel.get('name', i) if isinstance(rel, dict) else i}"
+        if not isinstance(rel, dict) or "output" not in rel:
+            raise ValueError(f"{where}: each release needs at least an \"output\".")
+        unknown = set(rel) - RELEASE_FIELDS
+        if unknown:
+            raise ValueError(f"{where}: unknown fields {sorted(unknown)}.")
+        fmt = rel.get("format", "verbose")
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"{where}: format must be one of {OUTPUT_FORMATS}.")
+        filt = rel.get("filter") or {}
+        for key, values in filt.items():
+            if key not in SCHEMA or not isinstance(values, list) or not values:
+                raise ValueError(f"{where}: filter needs a schema variable and a list of values ({key}).")
+        release = {
+            "name":         str(rel.get("name", Path(rel["output"]).stem)),
+            "output":       path.parent / rel["output"],
+            "min_cell":     int(rel.get("min_cell", 5)),
+            "format":       fmt,
+            "split_strata": bool(rel.get("split_strata", False)),
+            "gzip":         bool(rel.get("gzip", False)),
+            "filter":       {k: sorted({value_key(v) for v in vs}) for k, vs in filt.items()},
+        }
+        if release["name"] in names or release["output"] in outputs:
+            raise ValueError(f"{where}: release names and outputs must be unique.")
+        names.add(release["name"])
+        outputs.add(release["output"])
+        out.append(release)
+
+    input_path = config.get("input")
+    return (path.parent / input_path if input_path else None), out
+
+
+def record_filter(filt):
+    """Predicate for a release filter (see load_release_config()); None keeps everything."""
+    if not filt:
+        return None
+    allowed = [(key, set(values)) for key, values in filt.items()]
+    return lambda r: all(r.get(key) is not None and value_key(r[key]) in values for key, values in allowed)
+
+
+def release_states(records, schema, filters, chunk_size=STREAM_CHUNK):
+    """Fold ``records`` once into one running state per filter.
+
+    ``filters`` maps a hashable filter id to a record_filter() predicate.
+    Returns ``{filter id: state}``.
+    """
+    records = iter(records)
+    chunk = list(islice(records, chunk_size))
+    if not chunk:
+        raise ValueError("Input contains no records.")
+    var_keys, strat_vars = output_variables(schema, chunk[0]), find_strat_vars(schema, chunk[0])
+    states = {}
+    for fid in filters:
+        states[fid] = new_state(var_keys, strat_vars)
+        states[fid]["schema_keys"] = list(schema)
+
+    n = 0
+    while chunk:
+        n += len(chunk)
+        for fid, keep in filters.items():
+            subset = chunk if keep is None else [r for r in chunk if keep(r)]
+            if subset:
+                fold_records(states[fid], subset, schema)
+        print(f"  {n:,} records folded into {len(filters)} subsets…")
+        chunk = list(islice(records, chunk_size))
+    return states
+
+
+def suppress_stats(stats, min_cell):
+    """Apply min-cell suppression to one unsuppressed summarise() block."""
+    out = dict(stats)
+    if "frequencies" in stats:
+        out["frequencies"] = {
+            k: {"count": None, "label": fc["label"], "suppressed": True} if fc["count"] < min_cell else fc
+            for k, fc in stats["frequencies"].items()
+        }
+    if "histogram" in stats:
+        out["histogram"] = dict(stats["histogram"],
+                                counts=[None if c < min_cell else c for c in stats["histogram"]["counts"]])
+    return out
+
+
+def suppress_result(result, min_cell):
+    """aggregate()'s tuple at ``min_cell`` from the same tuple computed with min_cell=0.
+
+    Suppression only masks counts, so this matches a direct run at
+    ``min_cell``, including the suppressed_strata/suppressed_cells counts.
+    """
+    whole_cohort, strata, strat_vars, _, _, bins = result
+    if min_cell <= 0:
+        return result
+    suppressed_strata = 0
+    suppressed_cells  = 0
+
+    strata_out = {}
+    for strat_key, groups in strata.items():
+        strat_out = {}
+        for gk, g in groups.items():
+            if g["n"] < min_cell:
+                strat_out[gk] = {"label": g["label"], "n": None, "suppressed": True}
+                suppressed_strata += 1
+                continue
+            variables = {}
+            for key, var_stats in g["variables"].items():
+                variables[key] = suppress_stats(var_stats, min_cell)
+                suppressed_cells += count_suppressed(variables[key])
+            strat_out[gk] = {"label": g["label"], "n": g["n"], "variables": variables}
+        strata_out[strat_key] = strat_out
+
+    whole_cohort = {key: suppress_stats(stats, min_cell) for key, stats in whole_cohort.items()}
+    return whole_cohort, strata_out, strat_vars, suppressed_strata, suppressed_cells, bins
+
+
+def build_schema_block(schema, bins=None):
+    """Serialise schema to a JSON-safe dict (convert int keys to strings).
+
+    Numeric variables with a shared histogram layout in ``bins`` get a
+    ``bins`` entry holding its labels and edges, which every histogram's
+    ``counts`` (whole cohort and strata) index into.
+    """
+    bins = bins or {}
+    out = {}
+    for key, s in schema.items():
+        if s.get("group") == "id":
+            continue
+        entry = {k: v for k, v in s.items() if k != "codes"}
+        if s.get("codes"):
+            entry["codes"] = {str(k): v for k, v in s["codes"].items()}
+        if key in bins:
+            entry["bins"] = {"labels": bins[key][0], "edges": bin_edges(bins[key])}
+        out[key] = entry
+    return out
+
+
+# ── Compact output format ────────────────────────────────────────────────────
+#
+# The default ("verbose") output repeats field names, frequency labels and
+# per-cell objects in every stratum.  The compact format stores the same
+# numbers positionally, once per cell:
+#
+#   * ``variables`` lists the aggregated variables; ``whole_cohort`` and each
+#     stratum's cells are arrays in that order.
+#   * A cell is ``[n_total, n_valid, n_null, n_sentinel, ...]``, followed for
+#     numeric/integer variables with values by ``mean, sd, median, q1, q3,
+#     min, max, counts`` (``counts`` against ``schema[key].bins``), and for
+#     categorical/binary ones by ``levels, counts``: indices into
+#     ``schema[key].levels`` in output order and their counts.
+#   * With --ci, a stratum's numeric cell ends with ``[mean lo, mean hi,
+#     median lo, median hi]`` and a categorical one with the interval bounds
+#     of each level, flattened in the order of ``levels`` (null where a
+#     level has none, e.g. when suppressed).
+#   * Suppressed counts are ``SUPPRESSED`` (-1); a suppressed stratum is
+#     ``[-1]``, otherwise a stratum is ``[n, cells]``.
+#   * A ``strata2d`` block keeps its labels; each of its cells is encoded like
+#     a stratum, with cells in the order of the block's ``variables``; a
+#     suppressed variable block there is ``[-1]``, and numeric cells stop
+#     after ``max`` (strata2d has no histograms).
+#
+# Labels (codes, bin labels) live only in the schema block; index.html's
+# decodeAgg() expands a compact file back to the verbose structure.
+
+COMPACT_VERSION = 1
+SUPPRESSED = -1
+STAT_FIELDS = ("mean", "sd", "median", "q1", "q3", "min", "max")
+
+
+def _compact_counts(counts):
+    return [SUPPRESSED if c is None else c for c in counts]
+
+
+def _compact_cell(stats, levels):
+    if stats.get("suppressed"):
+        return [SUPPRESSED]
+    cell = [stats["n_total"], stats["n_valid"], stats["n_null"], stats["n_sentinel"]]
+    if "mean" in stats:
+        cell.extend(stats[f] for f in STAT_FIELDS)
+        # strata2d cells summarise numeric variables without a histogram
+        if "histogram" in stats:
+            cell.append(_compact_counts(stats["histogram"]["counts"]))
+            if "mean_ci" in stats or "median_ci" in stats:
+                cell.append([*(stats.get("mean_ci") or (None, None)), *(stats.get("median_ci") or (None, None))])
+    elif "frequencies" in stats:
+        freqs = stats["frequencies"]
+        cell.append([levels[k] for k in freqs])
+        cell.append(_compact_counts(fc["count"] for fc in freqs.values()))
+        if any("ci" in fc for fc in freqs.values()):
+            cell.append([b for fc in freqs.values() for b in fc.get("ci") or (None, None)])
+    return cell
+
+
+def compact_output(output):
+    """Re-encode a verbose output dict in the compact format (see above)."""
+    var_keys = list(output["whole_cohort"])
+    schema = {k: dict(v) for k, v in output["schema"].items()}
+
+    # Every frequency key of a stratum also occurs in the whole cohort
+    levels = {}
+    for key in var_keys:
+        freqs = output["whole_cohort"][key].get("frequencies")
+        if freqs is not None:
+            schema[key]["levels"] = list(freqs)
+            levels[key] = {k: i for i, k in enumerate(freqs)}
+
+    def cells(var_stats):
+        return [_compact_cell(var_stats[key], levels.get(key)) for key in var_keys]
+
+    strata = {}
+    for strat_key, groups in output["strata"].items():
+        strata[strat_key] = {
+            gk: [SUPPRESSED] if g.get("suppressed") else [g["n"], cells(g["variables"])]
+            for gk, g in groups.items()
+        }
+
+    compact = {
+        "meta":          dict(output["meta"], format="compact", format_version=COMPACT_VERSION),
+        "group_labels":  output["group_labels"],
+        "schema":        schema,
+        "variables":     var_keys,
+        "whole_cohort":  cells(output["whole_cohort"]),
+        "strata":        strata,
+    }
+    if "strata2d" in output:
+        compact["strata2d"] = {
+            pair: dict(block, cells={
+                a: {b: [SUPPRESSED] if c.get("suppressed") else
+                       [c["n"], [_compact_cell(c["variables"][k], levels.get(k)) for k in block["variables"]]]
+                    for b, c in row.items()}
+                for a, row in block["cells"].items()})
+            for pair, block in output["strata2d"].items()
+        }
+    return compact
+
+
+OUTPUT_FORMATS = ("verbose", "compact")
+
+
+# ── Split output ─────────────────────────────────────────────────────────────
+#
+# With --split-strata the output file becomes a manifest holding meta,
+# schema and whole_cohort, and each stratification variable's block goes to
+# its own file in ``<output stem>.strata/``; meta.strata_files maps each
+# stratifier to its file (relative to the manifest).  A shard file is
+# ``{"created": …, "strat_key": …, "strata": <block>}`` with the block in the
+# manifest's format, and ``created`` matching the manifest's so that stale
+# shards can be detected.  The dashboard loads a shard only when its
+# stratifier is first shown.
+
+def write_json(path, obj, gz=False):
+    """Write ``obj`` as minified JSON, plus a precompressed ``.gz`` copy with ``gz``.
+
+    Returns the number of bytes written (uncompressed).
+    """
+    data = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    path.write_bytes(data)
+    if gz:
+        # mtime=0 keeps the .gz byte-identical between runs with the same output
+        Path(f"{path}.gz").write_bytes(gzip.compress(data, mtime=0))
+    return len(data)
+
+
+def split_output(output, output_path, gz=False):
+    """Write ``output``'s strata to per-stratifier shard files; return the manifest.
+
+    Returns ``(manifest, shard_bytes)``.
+    """
+    shard_dir = output_path.with_name(f"{output_path.stem}.strata")
+    shard_dir.mkdir(exist_ok=True)
+    manifest = {k: v for k, v in output.items() if k != "strata"}
+    created = output["meta"]["created"]
+    files, shard_bytes = {}, 0
+    for strat_key, block in output["strata"].items():
+        name = f"{shard_dir.name}/{strat_key}.json"
+        shard_bytes += write_json(output_path.parent / name,
+                                  {"created": created, "strat_key": strat_key, "strata": block}, gz)
+        files[strat_key] = name
+    manifest["meta"] = dict(output["meta"], strata_files=files)
+    return manifest, shard_bytes
+
+
+def write_output(output_path, source_name, n_records, schema, result, min_cell, fmt="verbose",
+                 split=False, gz=False, cross=None, meta=None):
+    """Assemble the aggregated JSON from aggregate()'s result tuple and write it.
+
+    ``fmt`` is ``"verbose"`` (the default) or ``"compact"`` (see compact_output()).
+    With ``split`` the strata go to per-stratifier shard files (see
+    split_output()); ``gz`` also writes precompressed ``.gz`` copies.
+    ``cross`` is cross_stratify()'s result, written as ``strata2d``;
+    ``meta`` holds extra fields for the meta block.
+    """
+    whole_cohort, strata, strat_vars, supp_strata, supp_cells, bins = result
+    output = {
+        "meta": {
+            "created":            datetime.now(timezone.utc).isoformat(),
+            "source_file":        source_name,
+            "n":                  n_records,
+            "n_variables":        len(whole_cohort),
+            "strat_variables":    strat_vars,
+            "min_cell":           min_cell,
+            "suppressed_strata":  supp_strata,
+            "suppressed_cells":   supp_cells,
+            "tool":               "Generations Study — aggregate_data.py",
+            **(meta or {}),
+        },
+        "group_labels": GROUP_LABELS,
+        "schema":        build_schema_block(schema, bins),
+        "whole_cohort":  whole_cohort,
+        "strata":        strata,
+    }
+    if cross:
+        strata2d, supp_2d, comp_2d = cross
+        output["meta"].update(strata2d_suppressed_cells=supp_2d, strata2d_complementary_cells=comp_2d)
+        output["strata2d"] = strata2d
+
+    if fmt == "compact":
+        output = compact_output(output)
+
+    print(f"Writing {output_path} ({fmt})…")
+    if split:
+        output, shard_bytes = split_output(output, output_path, gz)
+    size_kb = write_json(output_path, output, gz) / 1024
+
+    print(f"Done. {output_path} ({size_kb:.1f} KB)")
+    if split:
+        print(f"  {len(strata)} stratum shards in {output_path.stem}.strata/ ({shard_bytes / 1024:.1f} KB).")
+    print(f"  Whole-cohort stats for {len(whole_cohort)} variables.")
+    print(f"  Stratified by {len(strata)} variables.")
+    print(f"  Suppressed: {supp_strata} strata and {supp_cells} frequency cells (min_cell={min_cell}).")
+    if cross:
+        print(f"  Cross-stratified {len(cross[0])} pairs: {cross[1]} cells suppressed, "
+              f"{cross[2]} hidden by complementary suppression.")
+
+
+# ── Entry point ──────────────────────────────────────────────────────────────
+
+def read_input(input_path, stream=False):
+    """Open the individual-level input.
+
+    Returns ``(records, schema)``: a list of records (or, with ``stream``, an
+    iterator over them) and SCHEMA filtered to the columns the data has.
+    """
+    if stream:
+        print(f"Streaming {input_path}…")
+        records = iter_records(input_path)
+        first = next(records, None)
+        if first is None:
+            raise ValueError("Input contains no records.")
+        data_keys = first.keys()
+        records = chain([first], records)
+    else:
+        print(f"Reading {input_path}…")
+        with open(input_path) as f:
+            records = json.load(f)
+
+        if not isinstance(records, list):
+            raise ValueError("Input must be a JSON array of records.")
+        print(f"  {len(records):,} records loaded.")
+        data_keys = set(records[0].keys()) if records else set()
+
+    # Filter schema to variables that actually exist in the data
+    schema = {k: v for k, v in SCHEMA.items() if k in data_keys}
+    print(f"  {len(schema)} schema variables matched to data columns.")
+    return records, schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate individual-level data for the Generations dashboard.")
+    parser.add_argument("--input",    default="synthetic_data.json",  help="Input JSON file (array of records)")
+    parser.add_argument("--output",   default="aggregated_data.json", help="Output aggregated JSON file")
+    parser.add_argument("--min-cell", default=5, type=int,
+                        help="Suppress frequency counts below this threshold (default: 5)")
+    parser.add_argument("--stream",   action="store_true",
+                        help="Read records one at a time (JSON array or NDJSON) into exact running "
+                             "tallies, which grow with the distinct values per stratum")
+    parser.add_argument("--workers",  default=1, type=int,
+                        help="Aggregate the cohort and each stratifier on N processes (default: 1)")
+    parser.add_argument("--engine",   default="python", choices=sorted(ENGINES),
+                        help="Statistics backend: pure Python (default) or NumPy-vectorised")
+    parser.add_argument("--format",   default="verbose", choices=OUTPUT_FORMATS, dest="fmt",
+                        help="Output encoding: verbose (default) or compact positional arrays")
+    parser.add_argument("--split-strata", action="store_true",
+                        help="Write a manifest plus one file per stratification variable")
+    parser.add_argument("--gzip",     action="store_true",
+                        help="Also write precompressed .gz copies of the output files")
+    parser.add_argument("--cache-dir", type=Path,
+                        help=f"Column cache location (default: {default_cache_dir()}); "
+                             "never the output's directory or below it")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Neither read nor write the decoded-column cache")
+    parser.add_argument("--cross",    nargs="?", const="", metavar="A:B,…",
+                        help="Also write two-way stratified summaries (strata2d) for these pairs "
+                             "(default pairs: " + ", ".join(":".join(p) for p in CROSS_PAIRS) + ")")
+    parser.add_argument("--append",   nargs="+", type=Path, metavar="BATCH",
+                        help="Fold these new batches into the running state kept beside --input "
+                             "and regenerate the output from it")
+    parser.add_argument("--ci",       action="store_true",
+                        help="Add 95%% bootstrap confidence intervals to every stratum's means, "
+                             "medians and proportions (needs NumPy)")
+    parser.add_argument("--ci-replicates", default=CI_REPLICATES, type=int, metavar="N",
+                        help=f"Bootstrap replicates for --ci (default: {CI_REPLICATES})")
+    parser.add_argument("--ci-seed",  default=CI_SEED, type=int,
+                        help=f"Random seed for --ci (default: {CI_SEED})")
+    parser.add_argument("--profile",  action="store_true",
+                        help="Time each phase and write a JSON run report beside the output")
+    parser.add_argument("--profile-hotspots", default=0, type=int, metavar="N",
+                        help="With --profile, also list the N hottest functions from cProfile")
+
+    commands = parser.add_subparsers(dest="command", metavar="{shard,merge,release}")
+    p_shard = commands.add_parser("shard", help="Aggregate one shard of the cohort to an unsuppressed state file")
+    p_shard.add_argument("--input",  required=True, help="Input JSON/NDJSON file for this shard")
+    p_shard.add_argument("--state",  required=True, help="State file to write (individual-level: do not share)")
+    p_shard.add_argument("--stream", action="store_true", help="Read the shard one record at a time")
+    p_merge = commands.add_parser("merge", help="Merge shard state files into the aggregated JSON")
+    p_merge.add_argument("states", nargs="+", help="State files, in input order")
+    p_merge.add_argument("--output",   default="aggregated_data.json", help="Output aggregated JSON file")
+    p_merge.add_argument("--min-cell", default=5, type=int,
+                         help="Suppress frequency counts below this threshold (default: 5)")
+    p_merge.add_argument("--format",   default="verbose", choices=OUTPUT_FORMATS, dest="fmt",
+                         help="Output encoding: verbose (default) or compact")
+    p_merge.add_argument("--split-strata", action="store_true",
+                         help="Write a manifest plus one file per stratification variable")
+    p_merge.add_argument("--gzip",     action="store_true",
+                         help="Also write precompressed .gz copies of the output files")
+    p_release = commands.add_parser("release", help="Write several release variants (min-cell thresholds, "
+                                                    "subsets) from one pass over the input")
+    p_release.add_argument("config", help="Release config JSON (see README)")
+    p_release.add_argument("--input",  help="Input JSON/NDJSON file (default: the config's \"input\")")
+    p_release.add_argument("--stream", action="store_true", help="Read records one at a time")
+    args = parser.parse_args()
+    for flag, value, default in (("--workers", args.workers, 1), ("--engine", args.engine, "python"),
+                                 ("--cache-dir", args.cache_dir, None), ("--cross", args.cross, None),
+                                 ("--ci", args.ci, False)):
+        if value != default and (args.stream or args.append or args.command):
+            parser.error(f"{flag} applies to in-memory aggregation only (not --stream, --append or subcommands)")
+    if args.append and args.command:
+        parser.error("--append applies to aggregation runs, not to subcommands")
+    if (args.profile or args.profile_hotspots) and args.command:
+        parser.error("--profile applies to aggregation runs, not to subcommands")
+    if args.ci_replicates < 1:
+        parser.error("--ci-replicates must be at least 1")
+    try:
+        cross_pairs = CROSS_PAIRS if args.cross == "" else args.cross and parse_cross_pairs(args.cross)
+    except ValueError as e:
+        parser.error(f"--cross: {e}")
+
+    if args.command == "shard":
+        input_path = Path(args.input)
+        records, schema = read_input(input_path, stream=args.stream)
+        print("Folding records into state…")
+        state = state_from_records(records, schema,
+                                   chunk_size=STREAM_CHUNK if args.stream else max(len(records), 1),
+                                   progress=args.stream)
+        state["source_files"] = [input_path.name]
+        print(f"Writing {args.state}…")
+        save_state(state, args.state)
+        print(f"Done. {state['n']:,} records in state (unsuppressed — do not share).")
+        return
+
+    if args.command == "release":
+        try:
+            config_input, releases = load_release_config(args.config)
+        except (OSError, ValueError) as e:
+            parser.error(f"release: {e}")
+        input_path = Path(args.input) if args.input else config_input
+        if input_path is None:
+            parser.error("release: no input (give --input or \"input\" in the config)")
+        records, schema = read_input(input_path, stream=args.stream)
+
+        # One state per distinct filter; variants sharing a subset share it
+        filters = {}
+        for rel in releases:
+            rel["subset"] = json.dumps(rel["filter"], sort_keys=True)
+            filters.setdefault(rel["subset"], record_filter(rel["filter"]))
+        print(f"Folding records for {len(releases)} releases ({len(filters)} subsets)…")
+        states = release_states(records, schema, filters)
+        for rel in releases:
+            if not states[rel["subset"]]["n"]:
+                raise SystemExit(f"Release {rel['name']}: the filter matches no records.")
+
+        raw = {}
+        for rel in releases:
+            state, min_cell = states[rel["subset"]], rel["min_cell"]
+            if rel["subset"] not in raw:
+                print(f"Summarising subset {rel['subset']} (n={state['n']})…")
+                raw[rel["subset"]] = finalise_state(state, schema, 0)
+            print(f"Release {rel['name']} (min_cell={min_cell}):")
+            result = suppress_result(raw[rel["subset"]], min_cell)
+            meta = {"release": rel["name"]}
+            if rel["filter"]:
+                meta["filter"] = rel["filter"]
+            rel["output"].parent.mkdir(parents=True, exist_ok=True)
+            write_output(rel["output"], input_path.name, state["n"], schema, result, min_cell, rel["format"],
+                         split=rel["split_strata"], gz=rel["gzip"], meta=meta)
+        return
+
+    if args.command == "merge":
+        min_cell = args.min_cell
+        print(f"Merging {len(args.states)} state files…")
+        state = load_state(args.states[0])
+        for path in args.states[1:]:
+            merge_state(state, load_state(path))
+        print(f"  {state['n']:,} records across {len(state['source_files'])} shards.")
+        try:
+            schema = state_schema(state)
+        except ValueError as e:
+            parser.error(f"merge: the state files were {e}; rebuild them with shard.")
+
+        print(f"Aggregating (min_cell={min_cell})…")
+        result = finalise_state(state, schema, min_cell)
+        print(f"  Suppression (min_cell={min_cell}): {result[3]} strata suppressed, "
+              f"{result[4]} frequency cells suppressed.")
+        write_output(Path(args.output), " + ".join(state["source_files"]), state["n"], schema, result,
+                     min_cell, args.fmt, split=args.split_strata, gz=args.gzip)
+        return
+
+    min_cell = args.min_cell
+    input_path  = Path(args.input)
+    output_path = Path(args.output)
+
+    engine = get_engine(args.engine)
+    profile = RunProfile(hotspots=args.profile_hotspots) if args.profile or args.profile_hotspots else NO_PROFILE
+    cross = None
+    ci = BootstrapCI(args.ci_replicates, args.ci_seed) if args.ci else None
+
+    source_name = input_path.name
+    if args.append:
+        with profile.phase("append"):
+            try:
+                state, schema = append_batches(input_path, args.append, stream=args.stream)
+            except ValueError as e:
+                parser.error(f"--append: {e}")
+        print(f"Aggregating (min_cell={min_cell})…")
+        with profile.phase("finalise"):
+            result = append_result(state, schema, min_cell)
+        print(f"  Suppression (min_cell={min_cell}): {result[3]} strata suppressed, "
+              f"{result[4]} frequency cells suppressed.")
+        n_records, source_name = state["n"], " + ".join(state["source_files"])
+    elif args.stream:
+        records, schema = read_input(input_path, stream=True)
+        print(f"Aggregating (min_cell={min_cell})…")
+        *result, n_records = aggregate_stream(records, schema, min_cell=min_cell, profile=profile)
+    else:
+        if args.no_cache:
+            with profile.phase("load"):
+                records, schema = read_input(input_path)
+            data_keys, n_records = records[0].keys(), len(records)
+            print(f"  Decoding columns (n={n_records})…")
+            with profile.phase("decode"):
+                columns = engine.build_columns(records, output_variables(schema, data_keys), schema)
+            del records
+        else:
+            cache_dir = args.cache_dir or default_cache_dir()
+            check_cache_dir(cache_dir, output_path, explicit=args.cache_dir is not None)
+            with profile.phase("load"):
+                columns, n_records, schema, data_keys = cached_columns(input_path, cache_dir)
+                columns = engine.adopt_columns(columns)
+        if cross_pairs:
+            check_cross_pairs(cross_pairs, find_strat_vars(schema, data_keys))
+        print(f"Aggregating (min_cell={min_cell})…")
+        result = aggregate_columns(columns, n_records, data_keys, schema, min_cell=min_cell,
+                                   workers=args.workers, engine=engine, profile=profile, ci=ci)
+        if cross_pairs:
+            with profile.phase("cross"):
+                cross = cross_stratify(columns, result[2], schema, cross_pairs, min_cell, engine)
+
+    with profile.phase("serialise"):
+        write_output(output_path, source_name, n_records, schema, tuple(result), min_cell, args.fmt,
+                     split=args.split_strata, gz=args.gzip, cross=cross, meta=ci and {"ci": ci.meta()})
+
+    if profile.enabled:
+        report_path = output_path.with_name(f"{output_path.stem}.profile.json")
+        report = profile.report(input_file=input_path.name, output_file=output_path.name, n=n_records,
+                                engine=engine.name, workers=args.workers, stream=args.stream,
+                                append=bool(args.append),
+                                cache=not (args.stream or args.no_cache or args.append), min_cell=min_cell,
+                                format=args.fmt, ci_replicates=ci and ci.replicates,
+                                python=sys.version.split()[0])
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        slowest = sorted(report["phases"], key=lambda p: -p["seconds"])[:3]
+        print(f"Run report: {report_path} ({report['total_seconds']:.2f} s; slowest "
+              + ", ".join(f"{p['name']} {p['seconds']:.2f} s" for p in slowest) + ")")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+benchmark.py — Generations Study Dashboard
+==========================================
+Benchmarks aggregate_data.py on schema-driven synthetic cohorts.
+
+The generator reads SCHEMA (types, codes, sentinels) and, when given a
+published aggregate such as aggregated_data.json, its whole-cohort null and
+sentinel rates, means, SDs, ranges and category frequencies, so synthetic
+records look like the real extract without containing any of it.
+
+The harness generates a cohort per size, runs the aggregation phase by phase
+and records wall time and peak memory per phase (load, decode, whole cohort,
+each stratification variable, serialisation).  Results are saved as JSON so
+runs on different commits can be compared, with a threshold-based check that
+exits non-zero on a regression.
+
+Usage:
+    python3 benchmark.py generate --rows 100000 --output synthetic_100k.json --seed 7
+    python3 benchmark.py run --sizes 1k,100k --output bench_results.json
+    python3 benchmark.py run --sizes 1k,100k --compare bench_baseline.json --threshold 0.25
+    python3 benchmark.py run --sizes 1m,10m --mode stream --no-memory
+
+Requirements: Python 3.8+  (no external packages needed; per-phase memory needs 3.9+)
+"""
+
+import json
+import io
+import random
+import shutil
+import argparse
+import contextlib
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from datetime import datetime, timezone
+
+import aggregate_data as agg
+
+
+# ── Variable profiles ────────────────────────────────────────────────────────
+#
+# A profile holds the sampling parameters of one variable: null and sentinel
+# rates plus either a truncated normal (mean, sd, lo, hi) for numeric and
+# integer variables or code weights for categorical and binary ones.
+
+DEFAULT_NULL_RATE     = 0.05
+DEFAULT_SENTINEL_RATE = 0.05
+
+
+def default_profile(schema_entry):
+    """Sampling parameters from SCHEMA alone."""
+    vtype = schema_entry.get("type", "numeric")
+    profile = {"null": DEFAULT_NULL_RATE,
+               "sentinel": DEFAULT_SENTINEL_RATE if schema_entry.get("sentinel") is not None else 0.0}
+    if vtype in agg.CODED_TYPES:
+        codes = list(schema_entry.get("codes") or {0: "", 1: ""})
+        # Geometric weights, so some strata are small enough to be suppressed
+        profile["codes"]   = codes
+        profile["weights"] = [0.5 ** i for i in range(len(codes))]
+    elif vtype in agg.NUMERIC_TYPES:
+        years = schema_entry.get("unit") == "years"
+        profile.update(mean=35.0 if years else 10.0, sd=10.0 if years else 5.0,
+                       lo=10.0 if years else 0.0, hi=80.0 if years else 40.0)
+    return profile
+
+
+def published_profile(schema_entry, stats):
+    """Sampling parameters from one variable's whole-cohort block of an aggregate."""
+    profile = default_profile(schema_entry)
+    n_total = stats.get("n_total") or 0
+    if not n_total:
+        return profile
+    profile["null"] = stats["n_null"] / n_total
+    if schema_entry.get("sentinel") is not None:
+        profile["sentinel"] = stats["n_sentinel"] / n_total
+
+    if "frequencies" in stats and stats["frequencies"]:
+        codes, weights = [], []
+        for k, fc in stats["frequencies"].items():
+            codes.append(int(k) if k.lstrip("-").isdigit() else k)
+            # Suppressed cells are known only to be small
+            weights.append(fc["count"] if fc["count"] is not None else 1)
+        profile["codes"], profile["weights"] = codes, weights
+    elif stats.get("mean") is not None:
+        profile.update(mean=stats["mean"], sd=stats["sd"] or 1.0, lo=stats["min"], hi=stats["max"])
+    return profile
+
+
+def variable_profiles(schema, published=None):
+    """``{key: profile}`` for every schema variable, from ``published`` where it has one."""
+    whole = (published or {}).get("whole_cohort", {})
+    if isinstance(whole, list):
+        raise ValueError("Profiles need a verbose-format aggregate (not --format compact).")
+    profiles = {}
+    for key, s in schema.items():
+        if s.get("type") == "string":
+            continue
+        stats = whole.get(key)
+        profiles[key] = published_profile(s, stats) if stats else default_profile(s)
+    return profiles
+
+
+# ── Synthetic cohort generator ───────────────────────────────────────────────
+
+def sample_value(rng, schema_entry, profile):
+    """One synthetic value (None, the sentinel or a drawn value)."""
+    u = rng.random()
+    if u < profile["null"]:
+        return None
+    if u < profile["null"] + profile["sentinel"]:
+        return schema_entry["sentinel"]
+
+    vtype = schema_entry.get("type", "numeric")
+    if vtype in agg.CODED_TYPES:
+        return rng.choices(profile["codes"], profile["weights"])[0]
+
+    x = min(max(rng.gauss(profile["mean"], profile["sd"]), profile["lo"]), profile["hi"])
+    return int(round(x)) if vtype == "integer" else round(x, 1)
+
+
+def generate_records(n, schema, profiles, seed=0):
+    """Yield ``n`` synthetic records; the same seed gives the same cohort."""
+    rng = random.Random(seed)
+    items = list(schema.items())
+    for i in range(n):
+        rec = {}
+        for key, s in items:
+            if s.get("type") == "string":
+                rec[key] = f"SYN{i:08d}"     # pseudo identifier, like R0_TCode
+            else:
+                rec[key] = sample_value(rng, s, profiles[key])
+        yield rec
+
+
+def write_cohort(path, records):
+    """Write records as NDJSON (``.ndjson``/``.jsonl``) or a JSON array; returns the count."""
+    n = 0
+    ndjson = path.suffix in (".ndjson", ".jsonl")
+    with open(path, "w") as f:
+        if not ndjson:
+            f.write("[\n")
+        for rec in records:
+            if not ndjson and n:
+                f.write(",\n")
+            f.write(json.dumps(rec, separators=(",", ":")))
+            if ndjson:
+                f.write("\n")
+            n += 1
+        if not ndjson:
+            f.write("\n]\n")
+    return n
+
+
+def parse_size(text):
+    """Row count from ``"1000"``, ``"100k"`` or ``"10m"``."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def size_label(n):
+    for div, suffix in ((1_000_000, "m"), (1_000, "k")):
+        if n >= div and n % div == 0:
+            return f"{n // div}{suffix}"
+    return str(n)
+
+
+# ── Phase timing ─────────────────────────────────────────────────────────────
+
+class PhaseTimer:
+    """Records wall time and (optionally) peak traced memory of named phases."""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory and hasattr(tracemalloc, "reset_peak")
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        # The aggregation functions report progress on stdout; keep it out of the way
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+        entry = {"seconds": round(time.perf_counter() - start, 4)}
+        if self.trace_memory:
+            entry["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+        self.phases[name] = entry
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace_memory:
+            tracemalloc.stop()
+
+
+def run_memory(path, out_path, timer, engine, min_cell):
+    """The in-memory pipeline of aggregate_data.main(), one phase at a time."""
+    with timer.phase("load"):
+        records, schema = agg.read_input(path)
+    with timer.phase("decode"):
+        data_keys = records[0].keys()
+        var_keys  = agg.output_variables(schema, data_keys)
+        columns   = engine.build_columns(records, var_keys, schema)
+        bins      = agg.column_bins(columns, var_keys, schema)
+    with timer.phase("whole_cohort"):
+        whole_cohort = agg.aggregate_cohort(columns, var_keys, schema, min_cell, engine, bins)
+
+    strat_vars = agg.find_strat_vars(schema, data_keys)
+    strata, supp_strata, supp_cells = {}, 0, 0
+    for strat_key in strat_vars:
+        with timer.phase(f"stratify:{strat_key}"):
+            strata[strat_key], n_strata, n_cells = agg.stratify(strat_key, columns, var_keys, schema,
+                                                                min_cell, engine, bins)
+        supp_strata += n_strata
+        supp_cells  += n_cells
+
+    result = (whole_cohort, strata, strat_vars, supp_strata, supp_cells, bins)
+    with timer.phase("serialise"):
+        agg.write_output(out_path, path.name, len(records), schema, result, min_cell)
+
+
+def run_stream(path, out_path, timer, min_cell):
+    """The --stream pipeline: records are folded while being read."""
+    with timer.phase("load_fold"):
+        records, schema = agg.read_input(path, stream=True)
+        state = agg.state_from_records(records, schema, progress=False)
+    with timer.phase("finalise"):
+        result = agg.finalise_state(state, schema, min_cell)
+    with timer.phase("serialise"):
+        agg.write_output(out_path, path.name, state["n"], schema, result, min_cell)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, data_dir, mode="memory", engine_name="python", min_cell=5, seed=0,
+                   profiles=None, trace_memory=True):
+    """Generate (or reuse) a cohort per size and time each phase; returns the results dict."""
+    schema = agg.SCHEMA
+    profiles = profiles or variable_profiles(schema)
+    engine = agg.get_engine(engine_name)
+    runs = []
+    for n in sizes:
+        run_mode = mode
+        path = data_dir / f"synthetic_{size_label(n)}_s{seed}.{'ndjson' if run_mode == 'stream' else 'json'}"
+        if not path.exists():
+            print(f"Generating {n:,} records → {path}…")
+            write_cohort(path, generate_records(n, schema, profiles, seed))
+        out_path = data_dir / f"aggregated_{size_label(n)}.json"
+
+        print(f"Benchmarking n={n:,} ({run_mode}, engine={engine.name})…")
+        with PhaseTimer(trace_memory) as timer:
+            if run_mode == "stream":
+                run_stream(path, out_path, timer, min_cell)
+            else:
+                run_memory(path, out_path, timer, engine, min_cell)
+        total = round(sum(p["seconds"] for p in timer.phases.values()), 4)
+        print(f"  {total:.2f} s over {len(timer.phases)} phases.")
+        runs.append({"n": n, "mode": run_mode, "input_bytes": path.stat().st_size,
+                     "total_seconds": total, "max_rss_mb": agg.memory_sample().get("max_rss_mb"),
+                     "phases": timer.phases})
+
+    return {
+        "meta": {
+            "created":      datetime.now(timezone.utc).isoformat(),
+            "commit":       git_commit(),
+            "python":       platform.python_version(),
+            "platform":     platform.platform(),
+            "engine":       engine.name,
+            "min_cell":     min_cell,
+            "seed":         seed,
+            "trace_memory": trace_memory and hasattr(tracemalloc, "reset_peak"),
+        },
+        "runs": runs,
+    }
+
+
+# ── Regression check ─────────────────────────────────────────────────────────
+
+def compare_results(baseline, current, threshold=0.25, min_seconds=0.05):
+    """Phases of ``current`` slower (or hungrier) than ``baseline`` by more than ``threshold``.
+
+    Phases are matched by size, mode and name.  Timing differences under
+    ``min_seconds`` are ignored as noise.  Returns a list of descriptions.
+    """
+    if baseline["meta"].get("trace_memory") != current["meta"].get("trace_memory"):
+        print("  Note: memory tracing differs between the runs; timings are not like for like.")
+    old_runs = {(r["n"], r["mode"]): r for r in baseline["runs"]}
+    problems = []
+    for run in current["runs"]:
+        old = old_runs.get((run["n"], run["mode"]))
+        if old is None:
+            continue
+        rows = [("total", {"seconds": old["total_seconds"]}, {"seconds": run["total_seconds"]})]
+        rows += [(name, old["phases"][name], p) for name, p in run["phases"].items() if name in old["phases"]]
+        for name, before, after in rows:
+            t0, t1 = before["seconds"], after["seconds"]
+            if t1 - t0 > min_seconds and t1 > t0 * (1 + threshold):
+                problems.append(f"n={run['n']:,} {name}: {t0:.3f} s → {t1:.3f} s (+{(t1 / t0 - 1) * 100:.0f}%)")
+            m0, m1 = before.get("peak_mb"), after.get("peak_mb")
+            if m0 and m1 and m1 - m0 > 1 and m1 > m0 * (1 + threshold):
+                problems.append(f"n={run['n']:,} {name}: peak {m0:.1f} MB → {m1:.1f} MB")
+    return problems
+
+
+# ── Entry point ──────────────────────────────────────────────────────────────
+
+def load_profiles(path):
+    if path is None:
+        return variable_profiles(agg.SCHEMA)
+    with open(path) as f:
+        return variable_profiles(agg.SCHEMA, json.load(f))
+
+
+def main():
+    default_profile_file = Path(__file__).resolve().parent / "aggregated_data.json"
+    # Options shared by both subcommands, given after the subcommand name
+    cohort_opts = argparse.ArgumentParser(add_help=False)
+    cohort_opts.add_argument("--profile", type=Path,
+                             default=default_profile_file if default_profile_file.exists() else None,
+                             help="Aggregate whose whole-cohort stats shape the synthetic data "
+                                  "(default: aggregated_data.json beside this script)")
+    cohort_opts.add_argument("--seed",    default=0, type=int, help="Random seed (default: 0)")
+
+    parser = argparse.ArgumentParser(description="Benchmark aggregate_data.py on synthetic cohorts.")
+    commands = parser.add_subparsers(dest="command", metavar="{generate,run}")
+    commands.required = True
+
+    p_gen = commands.add_parser("generate", parents=[cohort_opts], help="Write a synthetic cohort")
+    p_gen.add_argument("--rows",   required=True, type=parse_size, help="Number of records (e.g. 100k)")
+    p_gen.add_argument("--output", required=True, type=Path, help="Output file (.json array or .ndjson)")
+
+    p_run = commands.add_parser("run", parents=[cohort_opts],
+                                help="Time each aggregation phase at several cohort sizes")
+    p_run.add_argument("--sizes",     default="1k,100k",
+                       help="Comma-separated cohort sizes (default: 1k,100k; also e.g. 1m,10m)")
+    p_run.add_argument("--mode",      default="memory", choices=("memory", "stream"),
+                       help="Pipeline to time (default: memory; stream does not use less memory "
+                            "on every schema, see the README)")
+    p_run.add_argument("--engine",    default="python", choices=sorted(agg.ENGINES),
+                       help="Statistics backend for the in-memory pipeline")
+    p_run.add_argument("--min-cell",  default=5, type=int, help="Suppression threshold (default: 5)")
+    p_run.add_argument("--data-dir",  type=Path,
+                       help="Keep generated cohorts here and reuse them (default: a temporary directory)")
+    p_run.add_argument("--output",    default="bench_results.json", type=Path, help="Results JSON file")
+    p_run.add_argument("--no-memory", action="store_true",
+                       help="Skip tracemalloc (faster, timings closer to production; no per-phase peaks)")
+    p_run.add_argument("--compare",   type=Path, help="Earlier results JSON to check against")
+    p_run.add_argument("--threshold", default=0.25, type=float,
+                       help="Allowed fractional slowdown per phase before --compare fails (default: 0.25)")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profile)
+
+    if args.command == "generate":
+        print(f"Generating {args.rows:,} records → {args.output}…")
+        n = write_cohort(args.output, generate_records(args.rows, agg.SCHEMA, profiles, args.seed))
+        print(f"Done. {n:,} synthetic records ({args.output.stat().st_size / (1 << 20):.1f} MB).")
+        return
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    data_dir = args.data_dir or Path(tempfile.mkdtemp(prefix="generations-bench-"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        results = run_benchmarks(sizes, data_dir, args.mode, args.engine, args.min_cell, args.seed,
+                                 profiles, trace_memory=not args.no_memory)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}.")
+
+    for run in results["runs"]:
+        slowest = sorted(run["phases"].items(), key=lambda kv: -kv[1]["seconds"])[:3]
+        print(f"  n={run['n']:,}: {run['total_seconds']:.2f} s; slowest "
+              + ", ".join(f"{name} {p['seconds']:.2f} s" for name, p in slowest))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing with {args.compare} (threshold {args.threshold:.0%})…")
+        problems = compare_results(baseline, results, args.threshold)
+        for problem in problems:
+            print(f"  REGRESSION {problem}")
+        if problems:
+            raise SystemExit(f"{len(problems)} phases regressed.")
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+serve.py — Generations Study Dashboard
+======================================
+Local HTTP server for the aggregated data dashboard (started by start.sh).
+
+Serves the dashboard from the repository directory like
+``python3 -m http.server`` but:
+
+  * serves only the dashboard's own files: index.html and the images,
+    scripts and stylesheets beside it, the aggregated JSON and its
+    ``--split-strata`` shards.  Anything else in the directory — the
+    individual-level input, ``*.state.json``, column caches — is a 404;
+  * speaks HTTP/1.1, so the browser reuses one connection for the page,
+    its logos, the data and the strata it fetches afterwards;
+  * compresses text responses with gzip (using the ``.gz`` copies written by
+    ``aggregate_data.py --gzip`` when they are up to date);
+  * sends a strong ETag with every response and answers a matching
+    If-None-Match with 304, so a reload that finds nothing changed costs a
+    round trip instead of the whole file;
+  * sends Cache-Control: data and pages must be revalidated on each use,
+    other assets (logos) may be reused for an hour;
+  * keeps a parsed copy of the aggregated JSON in memory, reloaded when the
+    file's modification time or size changes, and serves from it
+        GET /aggregated_data.json?manifest=1   the file without its strata,
+                                               meta.strata_files pointing at
+        GET /api/strata/<variable>             one stratification variable's
+                                               block, as a shard file
+    Encoded responses for recently requested variables are kept in an LRU
+    cache.  The dashboard asks for the manifest; static hosts such as GitHub
+    Pages ignore the query and return the whole file, which it also reads.
+
+Usage:
+    python3 serve.py                     (http://localhost:8080/)
+    python3 serve.py --port 9090 --open
+
+Requirements: Python 3.8+  (no external packages needed)
+"""
+
+import argparse
+import errno
+import gzip
+import hashlib
+import json
+import sys
+import threading
+import webbrowser
+from collections import OrderedDict
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".svg", ".txt", ".md", ".csv"}
+ASSETS       = {".html", ".js", ".css", ".png", ".svg", ".ico"}   # served from the top level
+MIN_GZIP     = 1024          # bytes; smaller bodies are sent as they are
+REVALIDATE   = "no-cache"
+ASSET_CACHE  = "public, max-age=3600"
+STRATA_API   = "/api/strata/"
+
+
+# ── Representations ──────────────────────────────────────────────────────────
+#
+# A response body is held as a representation: ``(body, etag, encoding)``.
+# The ETag is a hash of the bytes actually sent, so the gzip and identity
+# forms of a file have different (strong) tags, as RFC 9110 requires.
+
+def representation(body, encoding=None):
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"', encoding
+
+
+def compress(body):
+    # mtime=0 keeps the bytes, and so the ETag, stable across restarts
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class LRUCache:
+    """A small thread-safe least-recently-used map."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, make):
+        """Value for ``key``, calling ``make()`` to create it on a miss."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = make()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+
+def file_version(path):
+    """``(mtime_ns, size)`` of ``path``, the key under which its contents are cached."""
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+# ── Static files ─────────────────────────────────────────────────────────────
+
+class StaticFiles:
+    """File representations, cached per path, version and encoding."""
+
+    def __init__(self, cache_size=64):
+        self._cache = LRUCache(cache_size)
+
+    def get(self, path, gzip_ok):
+        version = file_version(path)
+        use_gzip = gzip_ok and path.suffix in COMPRESSIBLE and version[1] >= MIN_GZIP
+        return self._cache.get((path, version, use_gzip), lambda: self._load(path, use_gzip))
+
+    @staticmethod
+    def _load(path, use_gzip):
+        body = path.read_bytes()
+        if not use_gzip:
+            return representation(body)
+        pre = Path(f"{path}.gz")
+        if pre.is_file() and pre.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return representation(pre.read_bytes(), "gzip")
+        return representation(compress(body), "gzip")
+
+
+# ── Aggregated data ──────────────────────────────────────────────────────────
+
+class AggregateStore:
+    """The aggregated JSON, parsed once per version of the file.
+
+    Works with whole files and with --split-strata manifests, whose strata
+    are read from their shard files on first request.  Encoded manifest and
+    stratum responses are cached per (file version, name, encoding).
+    """
+
+    def __init__(self, path, cache_size=64):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = None
+        self._doc = None
+        self._cache = LRUCache(cache_size)
+
+    def document(self):
+        """``(version, parsed file)``, re-reading the file if it has changed."""
+        version = file_version(self.path)
+        with self._lock:
+            if version != self._version:
+                with open(self.path, "rb") as f:
+                    self._doc = json.load(f)
+                self._version = version
+                print(f"Loaded {self.path.name} ({version[1] / 1024:.1f} KB).", file=sys.stderr)
+            return self._version, self._doc
+
+    def _encode(self, obj, gzip_ok):
+        body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        if gzip_ok and len(body) >= MIN_GZIP:
+            return representation(compress(body), "gzip")
+        return representation(body)
+
+    def manifest(self, gzip_ok):
+        """The file without its strata; meta.strata_files points at the stratum API."""
+        version, doc = self.document()
+
+        def make():
+            keys = list(doc["strata"]) if "strata" in doc else list(doc["meta"].get("strata_files", {}))
+            manifest = {k: v for k, v in doc.items() if k != "strata"}
+            manifest["meta"] = dict(doc["meta"], strata_files={k: STRATA_API.lstrip("/") + k for k in keys})
+            return self._encode(manifest, gzip_ok)
+        return self._cache.get((version, None, gzip_ok), make)
+
+    def stratum(self, key, gzip_ok):
+        """One stratifier's block as a shard file, or None if there is no such stratifier."""
+        version, doc = self.document()
+        name = None if "strata" in doc else doc["meta"].get("strata_files", {}).get(key)
+        if key not in doc.get("strata", {}) and name is None:
+            return None
+
+        def make():
+            if name is None:
+                block = doc["strata"][key]
+            else:
+                with open(self.path.parent / name, "rb") as f:
+                    block = json.load(f)["strata"]
+            shard = {"created": doc["meta"].get("created"), "strat_key": key, "strata": block}
+            return self._encode(shard, gzip_ok)
+        return self._cache.get((version, key, gzip_ok), make)
+
+
+# ── Request handling ─────────────────────────────────────────────────────────
+
+def dashboard_file(root, data_file, url_path):
+    """The file under ``root`` that ``url_path`` names, or None if it is not served.
+
+    Served: "/" (index.html), top-level files with a suffix in ASSETS, the
+    data file and the shard files in its ``<stem>.strata/`` directory.
+    Hidden names and ``..`` are never served.
+    """
+    parts = [p for p in url_path.split("/") if p] or ["index.html"]
+    if any(p.startswith(".") or "\\" in p or "\0" in p for p in parts):
+        return None
+    data = data_file.relative_to(root).parts
+    shard_dir = data[:-1] + (f"{data_file.stem}.strata",)
+    name = parts[-1]
+    if not (tuple(parts) == data
+            or (len(parts) == 1 and Path(name).suffix in ASSETS)
+            or (tuple(parts[:-1]) == shard_dir and name.endswith(".json"))):
+        return None
+    file = root.joinpath(*parts)
+    return file if file.is_file() else None
+
+
+def accepts_gzip(header):
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            q = params.strip().replace(" ", "")
+            return q not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def etag_matches(header, etag):
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    if header is None:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+class DashboardHandler(SimpleHTTPRequestHandler):
+    """Requests against ``server.static`` (StaticFiles) and ``server.store`` (AggregateStore)."""
+
+    server_version = "GenerationsDashboard/1.0"
+    # Every response carries Content-Length (send_error included), so
+    # connections can be kept alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        gzip_ok = accepts_gzip(self.headers.get("Accept-Encoding"))
+
+        try:
+            if path.startswith(STRATA_API):
+                rep = self.server.store.stratum(path[len(STRATA_API):], gzip_ok)
+                if rep is None:
+                    return self.send_error(HTTPStatus.NOT_FOUND, "No such stratification variable")
+                return self.send_representation(rep, "application/json", REVALIDATE, send_body)
+
+            if path == "/" + self.server.store.path.name and "manifest" in parse_qs(url.query):
+                rep = self.server.store.manifest(gzip_ok)
+                return self.send_representation(rep, "application/json", REVALIDATE, send_body)
+
+            file = dashboard_file(self.server.root, self.server.store.path, path)
+            if file is None:
+                return self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            rep = self.server.static.get(file, gzip_ok)
+            cache = REVALIDATE if file.suffix in (".html", ".json") else ASSET_CACHE
+            return self.send_representation(rep, self.guess_type(str(file)), cache, send_body)
+        except (OSError, ValueError) as e:
+            # The data file may be mid-write while aggregate_data.py runs
+            self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, f"Could not read data: {e}")
+
+    def send_representation(self, rep, content_type, cache_control, send_body):
+        body, etag, encoding = rep
+        not_modified = etag_matches(self.headers.get("If-None-Match"), etag)
+        self.send_response(HTTPStatus.NOT_MODIFIED if not_modified else HTTPStatus.OK)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+        if not not_modified:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        if send_body and not not_modified:
+            self.wfile.write(body)
+
+
+def make_server(directory, data_file, port, bind="127.0.0.1"):
+    directory = Path(directory).resolve()
+    server = ThreadingHTTPServer((bind, port), partial(DashboardHandler, directory=str(directory)))
+    server.root   = directory
+    server.static = StaticFiles()
+    server.store  = AggregateStore(directory / data_file)
+    return server
+
+
+def main():
+    here = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Serve the aggregated data dashboard locally.")
+    parser.add_argument("--port",      default=8080, type=int, help="Port (default: 8080)")
+    parser.add_argument("--bind",      default="127.0.0.1",
+                        help="Address to listen on (default: 127.0.0.1, this machine only)")
+    parser.add_argument("--directory", default=here, type=Path, help="Directory to serve (default: this one)")
+    parser.add_argument("--data",      default="aggregated_data.json",
+                        help="Aggregated JSON within the directory (default: aggregated_data.json)")
+    parser.add_argument("--open",      action="store_true", help="Open the dashboard in a browser")
+    args = parser.parse_args()
+
+    try:
+        server = make_server(args.directory, args.data, args.port, args.bind)
+    except OSError as e:
+        if e.errno == errno.EADDRINUSE:
+            raise SystemExit(f"Port {args.port} is already in use — stop the other server "
+                             f"or choose another port (./start.sh 9090).")
+        raise
+
+    url = f"http://localhost:{args.port}/"
+    print(f"Serving {Path(args.directory).resolve()} at {url} (Ctrl+C to stop)")
+    if args.open:
+        threading.Timer(0.2, webbrowser.open, (url,)).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 #!/bin/bash
 # ── Generations Study — Aggregated Dashboard Launcher ────────────────────────
-# Starts a local HTTP server and opens the aggregated data dashboard.
+# Starts the local dashboard server (serve.py) and opens the dashboard.
 # Usage:  ./start.sh          (default port 8080)
 #         ./start.sh 9090     (custom port)
 
@@ -15,11 +15,6 @@ echo "  URL:      ${URL}"
 echo "  Stop:     Ctrl+C"
 echo ""
 
-# Kill any existing server on this port
-lsof -ti tcp:${PORT} | xargs kill -9 2>/dev/null
-
-# Open browser after a short delay (let the server start first)
-(sleep 0.8 && open "${URL}") &
-
-# Start server (Python 3)
-cd "${DIR}" && python3 -m http.server ${PORT}
+# serve.py compresses responses, answers unchanged files with 304 and opens
+# the browser once it is listening; if the port is taken it says so and exits
+exec python3 "${DIR}/serve.py" --port "${PORT}" --directory "${DIR}" --open
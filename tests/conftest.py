@@ -0,0 +1,71 @@
+"""Shared fixtures: a small synthetic cohort and helpers for running aggregate_data."""
+
+import contextlib
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import aggregate_data as agg  # noqa: E402
+import benchmark  # noqa: E402
+
+COHORT_SIZE = 400
+
+
+def make_cohort(n, seed):
+    profiles = benchmark.variable_profiles(agg.SCHEMA)
+    return list(benchmark.generate_records(n, agg.SCHEMA, profiles, seed=seed))
+
+
+@pytest.fixture(autouse=True)
+def private_cache(tmp_path_factory, monkeypatch):
+    """Keep column caches written by tests out of the real per-user cache."""
+    xdg = tmp_path_factory.mktemp("xdg")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(xdg))
+    return xdg / "generations-aggregate"
+
+
+@pytest.fixture(scope="session")
+def cohort():
+    """400 synthetic records from the built-in schema (SCHEMA-only profiles, seed 1)."""
+    return make_cohort(COHORT_SIZE, seed=1)
+
+
+@pytest.fixture(scope="session")
+def schema(cohort):
+    return {k: v for k, v in agg.SCHEMA.items() if k in cohort[0]}
+
+
+@pytest.fixture
+def write_json(tmp_path):
+    """Write an object as JSON under the test's tmp_path and return the path."""
+    def write(name, obj):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(obj))
+        return path
+    return write
+
+
+def quiet(fn, *args, **kwargs):
+    """Call ``fn`` with its progress output swallowed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def run_main(monkeypatch, *argv):
+    """Run aggregate_data.main() with ``argv``, quietly."""
+    monkeypatch.setattr(sys, "argv", ["aggregate_data.py", *map(str, argv)])
+    quiet(agg.main)
+
+
+def read_output(path):
+    """An output file without its run-specific ``meta.created`` timestamp."""
+    with open(path) as f:
+        out = json.load(f)
+    out["meta"].pop("created", None)
+    return out
@@ -0,0 +1,77 @@
+"""Incremental appends must reproduce a full run over the input plus every batch."""
+
+import math
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet, read_output, run_main
+
+
+@pytest.fixture
+def batches(tmp_path, write_json, cohort):
+    """The cohort as an input file and three batches, the last of them stretching two variables' range."""
+    tail = [dict(r) for r in cohort[390:]]
+    tail[0]["R0_BMI"], tail[1]["R0_Height"] = 75.25, 120.0
+    return (write_json("cohort.json", cohort[:300]),
+            [write_json("b1.json", cohort[300:350]), write_json("b2.json", cohort[350:390]),
+             write_json("b3.json", tail)],
+            cohort[:390] + tail)
+
+
+def append(monkeypatch, base, batch, output):
+    run_main(monkeypatch, "--input", base, "--output", output, "--append", batch)
+
+
+def test_append_matches_full_run(monkeypatch, tmp_path, write_json, batches, schema):
+    base, parts, records = batches
+    for batch in parts:
+        append(monkeypatch, base, batch, tmp_path / "appended.json")
+    state = agg.load_append_state(agg.append_state_path(base))
+    assert state["n"] == len(records) and [b["file"] for b in state["batches"]] == ["b1.json", "b2.json", "b3.json"]
+    for min_cell in (0, 5):
+        assert agg.append_result(state, schema, min_cell) == quiet(agg.aggregate, records, schema, min_cell=min_cell)
+
+    run_main(monkeypatch, "--input", write_json("all.json", records), "--output", tmp_path / "direct.json",
+             "--no-cache")
+    appended, direct = read_output(tmp_path / "appended.json"), read_output(tmp_path / "direct.json")
+    assert appended["meta"].pop("source_file") == "cohort.json + b1.json + b2.json + b3.json"
+    direct["meta"].pop("source_file")
+    assert appended == direct
+
+
+def test_state_is_private_and_refuses_a_batch_twice(monkeypatch, tmp_path, batches):
+    base, (b1, *_), _ = batches
+    append(monkeypatch, base, b1, tmp_path / "out.json")
+    assert agg.append_state_path(base).stat().st_mode & 0o777 == 0o600
+    with pytest.raises(SystemExit, match="already been appended"):
+        append(monkeypatch, base, b1, tmp_path / "out.json")
+
+
+def test_damaged_state_asks_for_a_rebuild(monkeypatch, tmp_path, batches, capsys):
+    base, (b1, b2, _), _ = batches
+    append(monkeypatch, base, b1, tmp_path / "out.json")
+    path = agg.append_state_path(base)
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(SystemExit) as exit_info:
+        append(monkeypatch, base, b2, tmp_path / "out.json")
+    assert exit_info.value.code == 2
+    assert "values outside the file" in capsys.readouterr().err
+
+
+def test_append_asks_to_rebuild_a_state_from_another_schema(monkeypatch, tmp_path, batches, capsys):
+    base, (b1, b2, _), _ = batches
+    append(monkeypatch, base, b1, tmp_path / "out.json")
+    monkeypatch.delitem(agg.SCHEMA, "R0_BMI")
+    with pytest.raises(SystemExit) as exit_info:
+        append(monkeypatch, base, b2, tmp_path / "out.json")
+    assert exit_info.value.code == 2
+    assert "different SCHEMA (no longer has R0_BMI)" in capsys.readouterr().err
+
+
+def test_exact_sums_are_correctly_rounded():
+    values = [1e16, 1.0, -1e16, 3.0, 0.1, 2.5e-300]
+    total = agg.ExactSum()
+    for x in values:
+        total.add(*x.as_integer_ratio())
+    assert float(total) == math.fsum(values)
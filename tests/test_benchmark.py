@@ -0,0 +1,33 @@
+"""benchmark.py: shared options on each subcommand, and a seeded generator."""
+
+import json
+import sys
+
+import benchmark
+from conftest import quiet
+
+
+def run_benchmark(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["benchmark.py", *map(str, argv)])
+    quiet(benchmark.main)
+
+
+def test_generate_takes_seed_and_profile(monkeypatch, tmp_path, write_json):
+    profile = write_json("agg.json", {"whole_cohort": {"R0_BMI": {
+        "n_total": 10, "n_null": 0, "n_sentinel": 0, "mean": 50.0, "sd": 0.1, "min": 49.0, "max": 51.0}}})
+    paths = {}
+    for name, seed in (("a", 1), ("b", 1), ("c", 2)):
+        paths[name] = tmp_path / f"{name}.json"
+        run_benchmark(monkeypatch, "generate", "--rows", 30, "--output", paths[name], "--seed", seed,
+                      "--profile", profile)
+    a, b, c = (json.loads(paths[k].read_text()) for k in "abc")
+    assert a == b != c
+    assert all(49.0 <= r["R0_BMI"] <= 51.0 for r in a if r["R0_BMI"] not in (None, 999))
+
+
+def test_run_takes_seed(monkeypatch, tmp_path):
+    out = tmp_path / "bench.json"
+    run_benchmark(monkeypatch, "run", "--sizes", "40", "--no-memory", "--output", out, "--seed", 5)
+    results = json.loads(out.read_text())
+    assert results["meta"]["seed"] == 5
+    assert [run["n"] for run in results["runs"]] == [40]
@@ -0,0 +1,56 @@
+"""Bootstrap intervals depend on the seed and nothing else."""
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet
+
+pytest.importorskip("numpy")
+
+REPLICATES = 60
+
+
+def with_ci(cohort, schema, seed=agg.CI_SEED, **kwargs):
+    return quiet(agg.aggregate, cohort, schema, min_cell=5,
+                 ci=agg.BootstrapCI(replicates=REPLICATES, seed=seed), **kwargs)
+
+
+def intervals(result):
+    """Every interval in a result's strata, keyed by where it sits."""
+    found = {}
+    for strat_key, groups in result[1].items():
+        for gk, g in groups.items():
+            for key, stats in g.get("variables", {}).items():
+                for field in ("mean_ci", "median_ci"):
+                    if field in stats:
+                        found[strat_key, gk, key, field] = stats[field]
+                for code, fc in stats.get("frequencies", {}).items():
+                    if "ci" in fc:
+                        found[strat_key, gk, key, code] = fc["ci"]
+    return found
+
+
+@pytest.fixture(scope="module")
+def reference(cohort, schema):
+    return with_ci(cohort, schema)
+
+
+def test_every_kind_of_interval_is_present(reference):
+    kinds = {where[-1] if where[-1].endswith("_ci") else "proportion" for where in intervals(reference)}
+    assert kinds == {"mean_ci", "median_ci", "proportion"}
+
+
+def test_same_seed_gives_the_same_intervals(cohort, schema, reference):
+    assert with_ci(cohort, schema) == reference
+
+
+def test_intervals_do_not_depend_on_workers_or_engine(cohort, schema, reference):
+    assert with_ci(cohort, schema, workers=2) == reference
+    assert with_ci(cohort, schema, engine=agg.get_engine("numpy")) == reference
+
+
+def test_another_seed_gives_other_intervals(cohort, schema, reference):
+    other = intervals(with_ci(cohort, schema, seed=agg.CI_SEED + 1))
+    expected = intervals(reference)
+    assert other.keys() == expected.keys()
+    assert sum(other[k] != expected[k] for k in expected) > len(expected) // 2
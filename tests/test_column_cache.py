@@ -0,0 +1,113 @@
+"""The column cache must give the columns a fresh decode gives, or miss."""
+
+import json
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet, run_main
+
+
+@pytest.fixture
+def cached_input(tmp_path, write_json, cohort):
+    return write_json("cohort.json", cohort)
+
+
+def load(input_path, cache_dir):
+    columns, n, schema, data_keys = quiet(agg.cached_columns, input_path, cache_dir)
+    return agg.materialise_columns(columns), n, schema, list(data_keys)
+
+
+def test_hit_matches_fresh_decode(cached_input, private_cache, cohort, schema):
+    fresh = agg.build_columns(cohort, agg.output_variables(schema, cohort[0]), schema)
+    miss = load(cached_input, private_cache)
+    before = agg.COUNTERS["column_cache_hits"]
+    hit = load(cached_input, private_cache)
+    assert agg.COUNTERS["column_cache_hits"] == before + 1
+    assert miss == hit == (fresh, len(cohort), schema, list(cohort[0]))
+
+
+def test_cached_run_matches_uncached(cached_input, private_cache, cohort, schema):
+    quiet(agg.cached_columns, cached_input, private_cache)
+    columns, n, schema_c, data_keys = quiet(agg.cached_columns, cached_input, private_cache)
+    result = quiet(agg.aggregate_columns, agg.PYTHON_ENGINE.adopt_columns(columns), n, data_keys, schema_c)
+    assert result == quiet(agg.aggregate, cohort, schema)
+
+
+def cache_file(cache_dir):
+    path, = cache_dir.glob("*.cols")
+    return path
+
+
+def rewrite_header(path, edit):
+    data = path.read_bytes()
+    magic = len(agg.CACHE_MAGIC)
+    base = magic + 8 + int.from_bytes(data[magic:magic + 8], "little")
+    header = json.loads(data[magic + 8:base])
+    edit(header)
+    head = json.dumps(header, separators=(",", ":")).encode()
+    head += b" " * (base - magic - 8 - len(head))
+    assert len(head) == base - magic - 8
+    path.write_bytes(data[:magic + 8] + head + data[base:])
+
+
+def shorten_values(header):
+    arrays = next(c for c in header["columns"].values() if "values" in c["arrays"])["arrays"]
+    arrays["values"][1] -= 1
+
+
+@pytest.mark.parametrize("damage", [
+    lambda p: p.write_bytes(p.read_bytes()[:-8]),                               # truncated data
+    lambda p: p.write_bytes(p.read_bytes()[:len(agg.CACHE_MAGIC) + 20]),        # truncated header
+    lambda p: p.write_bytes(p.read_bytes().replace(b'"columns"', b'"columns"x', 1)),  # bad JSON
+    lambda p: rewrite_header(p, shorten_values),                                # length mismatch
+    lambda p: rewrite_header(p, lambda h: h.update(columns=[])),                # malformed header
+], ids=["truncated", "truncated_header", "bad_json", "length_mismatch", "malformed"])
+def test_damaged_cache_is_a_miss_and_rebuilt(cached_input, private_cache, damage):
+    expected = load(cached_input, private_cache)
+    path = cache_file(private_cache)
+    damage(path)
+    assert agg.load_column_cache(path) is None
+    misses = agg.COUNTERS["column_cache_misses"]
+    assert load(cached_input, private_cache) == expected
+    assert agg.COUNTERS["column_cache_misses"] == misses + 1
+    assert agg.load_column_cache(path) is not None
+
+
+def test_miss_replaces_the_inputs_earlier_entry(tmp_path, write_json, private_cache, cohort):
+    first = write_json("cohort.json", cohort[:100])
+    other = write_json("other.json", cohort[100:200])
+    load(first, private_cache)
+    load(other, private_cache)
+    other_entry = agg.cache_key(other)
+    unrelated = private_cache / ("0" * 40 + ".cols")  # not an entry keyed by this input's path
+    unrelated.write_bytes(b"")
+
+    write_json("cohort.json", cohort[:150])
+    assert load(first, private_cache)[1] == 150
+    assert sorted(p.stem for p in private_cache.glob("*.cols")) == sorted(
+        [agg.cache_key(first), other_entry, unrelated.stem])
+
+
+def test_default_cache_dir_is_refused_as_the_output_dir(monkeypatch, cached_input, private_cache):
+    private_cache.mkdir(parents=True)
+    output = private_cache / "aggregated_data.json"
+    with pytest.raises(SystemExit, match="Refusing to cache"):
+        run_main(monkeypatch, "--input", cached_input, "--output", output)
+    assert not list(private_cache.glob("*.cols"))
+    run_main(monkeypatch, "--input", cached_input, "--output", output, "--no-cache")
+    assert output.exists()
+
+
+def test_default_cache_dir_below_the_output_dir_is_used(monkeypatch, cached_input, private_cache):
+    output = private_cache.parent.parent / "aggregated_data.json"     # e.g. output in $HOME, cache in ~/.cache
+    run_main(monkeypatch, "--input", cached_input, "--output", output)
+    assert output.exists()
+    assert len(list(private_cache.glob("*.cols"))) == 1
+
+
+def test_explicit_cache_dir_below_the_output_dir_is_refused(monkeypatch, tmp_path, cached_input):
+    output = tmp_path / "aggregated_data.json"
+    with pytest.raises(SystemExit, match="Refusing to cache"):
+        run_main(monkeypatch, "--input", cached_input, "--output", output, "--cache-dir", tmp_path / "cache")
+    assert not (tmp_path / "cache").exists()
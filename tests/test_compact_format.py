@@ -0,0 +1,73 @@
+"""The dashboard's decoder must turn a compact file back into the verbose one."""
+
+import json
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet, read_output
+
+NODE = shutil.which("node")
+INDEX_HTML = Path(__file__).resolve().parent.parent / "index.html"
+
+pytestmark = pytest.mark.skipif(NODE is None, reason="needs node to run the dashboard's decoder")
+
+
+def dashboard_decoder():
+    """STAT_FIELDS and decodeAgg() from index.html, as a standalone script."""
+    page = INDEX_HTML.read_text()
+    match = re.search(r"^const STAT_FIELDS.*?^}\n", page, re.S | re.M)
+    return match.group(0)
+
+
+def decode_in_node(path):
+    script = dashboard_decoder() + """
+const fs = require('fs');
+const { decodeGroups, ...out } = decodeAgg(JSON.parse(fs.readFileSync(process.argv[1], 'utf8')));
+process.stdout.write(JSON.stringify(out));
+"""
+    done = subprocess.run([NODE, "-e", script, str(path)], capture_output=True, text=True, check=True)
+    return json.loads(done.stdout)
+
+
+def write_both(tmp_path, cohort, schema, min_cell, ci=None):
+    columns = agg.build_columns(cohort, agg.output_variables(schema, cohort[0]), schema)
+    result = quiet(agg.aggregate_columns, columns, len(cohort), cohort[0].keys(), schema, min_cell, ci=ci)
+    cross = quiet(agg.cross_stratify, columns, result[2], schema, agg.CROSS_PAIRS, min_cell)
+    paths = {}
+    for fmt in agg.OUTPUT_FORMATS:
+        paths[fmt] = tmp_path / f"{fmt}.json"
+        quiet(agg.write_output, paths[fmt], "cohort.json", len(cohort), schema, result, min_cell, fmt,
+              cross=cross, meta=ci and {"ci": ci.meta()})
+    return paths
+
+
+def assert_same_data(decoded, verbose):
+    for field in ("whole_cohort", "strata", "strata2d", "group_labels"):
+        assert decoded[field] == verbose[field], field
+
+
+@pytest.mark.parametrize("min_cell", [0, 5, 40])
+def test_compact_decodes_to_verbose(tmp_path, cohort, schema, min_cell):
+    paths = write_both(tmp_path, cohort, schema, min_cell)
+    verbose = read_output(paths["verbose"])
+    assert verbose["strata2d"]
+    assert_same_data(decode_in_node(paths["compact"]), verbose)
+
+
+def test_compact_decodes_confidence_intervals(tmp_path, cohort, schema):
+    pytest.importorskip("numpy")
+    paths = write_both(tmp_path, cohort, schema, 5, ci=agg.BootstrapCI(replicates=50))
+    verbose = read_output(paths["verbose"])
+    assert any("mean_ci" in v for g in verbose["strata"]["R0_Menopause"].values() if not g.get("suppressed")
+               for v in g["variables"].values())
+    assert_same_data(decode_in_node(paths["compact"]), verbose)
+
+
+def test_verbose_passes_through(tmp_path, cohort, schema):
+    paths = write_both(tmp_path, cohort, schema, 5)
+    assert_same_data(decode_in_node(paths["verbose"]), read_output(paths["verbose"]))
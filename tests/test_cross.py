@@ -0,0 +1,58 @@
+"""Two-way cross-stratification: cell summaries and complementary suppression."""
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet
+
+PAIR = ("R0_Menopause", "R0_HRTStatus")
+
+
+@pytest.fixture(scope="module")
+def block(cohort, schema):
+    columns = agg.build_columns(cohort, agg.output_variables(schema, cohort[0]), schema)
+    strat_vars = agg.find_strat_vars(schema, cohort[0])
+    strata2d, _, _ = quiet(agg.cross_stratify, columns, strat_vars, schema, [PAIR], 5)
+    return strata2d[":".join(PAIR)]
+
+
+def cell_records(cohort, a, b):
+    return [r for r in cohort if r[PAIR[0]] is not None and agg.value_key(r[PAIR[0]]) == a
+            and r[PAIR[1]] is not None and agg.value_key(r[PAIR[1]]) == b]
+
+
+def test_numeric_summaries_match_the_cells_records(cohort, schema, block):
+    numeric = [k for k in block["variables"] if schema[k]["type"] in agg.NUMERIC_TYPES]
+    assert numeric
+    checked = 0
+    for a, row in block["cells"].items():
+        for b, cell in row.items():
+            if cell.get("suppressed"):
+                continue
+            records = cell_records(cohort, a, b)
+            assert cell["n"] == len(records)
+            for k in numeric:
+                stats = cell["variables"][k]
+                if stats.get("suppressed"):
+                    continue
+                expected = agg.aggregate_variable(k, records, schema[k])
+                expected.pop("histogram")
+                assert stats == expected
+                checked += 1
+    assert checked
+
+
+def test_numeric_suppression_is_complementary(schema, block):
+    numeric = [k for k in block["variables"] if schema[k]["type"] in agg.NUMERIC_TYPES]
+    cells = [(a, b, c) for a, row in block["cells"].items() for b, c in row.items()]
+    for k in numeric:
+        hidden = {(a, b) for a, b, c in cells if c.get("suppressed") or c["variables"][k].get("suppressed")}
+        for a, b, c in cells:
+            if (a, b) not in hidden:
+                assert not 0 < c["variables"][k]["n_valid"] < 5
+        for axis in (0, 1):
+            lines = {}
+            for a, b, _ in cells:
+                lines.setdefault((a, b)[axis], []).append((a, b))
+            for line in lines.values():
+                assert sum(cell in hidden for cell in line) != 1, (k, line)
@@ -0,0 +1,49 @@
+"""--profile writes a run report beside the output, and only with --profile."""
+
+import json
+
+from conftest import run_main
+
+
+def report_for(output):
+    return output.with_name(f"{output.stem}.profile.json")
+
+
+def test_report_names_phases_and_counts_records(monkeypatch, tmp_path, write_json, cohort):
+    source = write_json("cohort.json", cohort)
+    output = tmp_path / "out.json"
+    run_main(monkeypatch, "--input", source, "--output", output, "--no-cache", "--profile")
+
+    with open(report_for(output)) as f:
+        report = json.load(f)
+    with open(output) as f:
+        strat_vars = json.load(f)["meta"]["strat_variables"]
+    assert report["meta"]["n"] == len(cohort)
+    assert report["meta"]["input_file"] == source.name
+    assert report["meta"]["output_file"] == output.name
+    assert report["meta"]["cache"] is False
+    assert [p["name"] for p in report["phases"]] == [
+        "load", "decode", "whole_cohort", *(f"stratify:{k}" for k in strat_vars), "serialise"]
+    assert all(p["seconds"] >= 0 for p in report["phases"])
+    assert report["counters"]["records_decoded"] == len(cohort)
+    assert "hotspots" not in report
+
+
+def test_stream_report_has_stream_phases(monkeypatch, tmp_path, write_json, cohort):
+    source = write_json("cohort.json", cohort)
+    output = tmp_path / "out.json"
+    run_main(monkeypatch, "--input", source, "--output", output, "--stream", "--profile")
+
+    with open(report_for(output)) as f:
+        report = json.load(f)
+    assert report["meta"]["n"] == len(cohort) and report["meta"]["stream"] is True
+    assert [p["name"] for p in report["phases"]] == ["load_fold", "finalise", "serialise"]
+
+
+def test_no_report_without_profile(monkeypatch, tmp_path, write_json, cohort):
+    source = write_json("cohort.json", cohort)
+    output = tmp_path / "out.json"
+    run_main(monkeypatch, "--input", source, "--output", output, "--no-cache")
+    assert output.exists()
+    assert not report_for(output).exists()
+    assert not list(tmp_path.glob("*.profile.json"))
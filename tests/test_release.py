@@ -0,0 +1,53 @@
+"""Release variants must match direct runs over the same subset at the same min-cell."""
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet, read_output, run_main
+
+FILTER = {"R0_Menopause": [2, 3]}
+FILTER_KEYS = {"R0_Menopause": ["2", "3"]}        # as load_release_config() normalises it
+
+
+def subset(cohort, filt):
+    keep = agg.record_filter(filt)
+    return [r for r in cohort if keep is None or keep(r)]
+
+
+@pytest.fixture(scope="module")
+def raw(cohort, schema):
+    filters = {"all": None, "filtered": agg.record_filter(FILTER_KEYS)}
+    states = quiet(agg.release_states, cohort, schema, filters, chunk_size=64)
+    return {fid: agg.finalise_state(state, schema, 0) for fid, state in states.items()}
+
+
+@pytest.mark.parametrize("min_cell", [0, 1, 5, 20, 120])
+@pytest.mark.parametrize("fid, filt", [("all", {}), ("filtered", FILTER_KEYS)])
+def test_suppressed_variants_match_direct_runs(raw, cohort, schema, fid, filt, min_cell):
+    records = subset(cohort, filt)
+    assert agg.suppress_result(raw[fid], min_cell) == quiet(agg.aggregate, records, schema, min_cell=min_cell)
+
+
+def test_release_command_matches_direct_runs(monkeypatch, tmp_path, write_json, cohort):
+    full = write_json("cohort.json", cohort)
+    write_json("filtered.json", subset(cohort, FILTER_KEYS))
+    releases = [
+        {"name": "internal", "output": "out/internal.json", "min_cell": 0},
+        {"name": "public", "output": "out/public.json", "min_cell": 10, "format": "compact"},
+        {"name": "subset", "output": "out/subset.json", "min_cell": 5, "filter": FILTER},
+    ]
+    config = write_json("releases.json", {"input": full.name, "releases": releases})
+    run_main(monkeypatch, "release", config)
+
+    for rel in releases:
+        source = "filtered.json" if "filter" in rel else "cohort.json"
+        direct = tmp_path / f"direct-{rel['name']}.json"
+        run_main(monkeypatch, "--input", tmp_path / source, "--output", direct, "--no-cache",
+                 "--min-cell", rel["min_cell"], "--format", rel.get("format", "verbose"))
+        released, expected = read_output(tmp_path / rel["output"]), read_output(direct)
+        assert released["meta"].pop("release") == rel["name"]
+        if "filter" in rel:
+            assert released["meta"].pop("filter") == FILTER_KEYS
+        for out in (released, expected):
+            out["meta"].pop("source_file")
+        assert released == expected
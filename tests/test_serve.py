@@ -0,0 +1,200 @@
+"""The dashboard server serves the dashboard's files and nothing else."""
+
+import contextlib
+import gzip
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+import aggregate_data as agg
+import serve
+from conftest import quiet
+
+DATA = "aggregated_data.json"
+
+
+@contextlib.contextmanager
+def running(directory):
+    """A live server for ``directory`` on an ephemeral port."""
+    httpd = serve.make_server(directory, DATA, 0)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield httpd
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("site")
+    (tmp_path / "index.html").write_text("<!doctype html><title>dashboard</title>")
+    (tmp_path / "logo-g.png").write_bytes(b"\x89PNG")
+    (tmp_path / DATA).write_text(json.dumps({"meta": {"created": "t"}, "strata": {}}))
+    (tmp_path / "aggregated_data.strata").mkdir()
+    (tmp_path / "aggregated_data.strata" / "R0_Menopause.json").write_text("{}")
+    (tmp_path / "cohort.json").write_text("[]")
+    (tmp_path / "cohort.state.json").write_text("{}")
+    (tmp_path / ".env").write_text("SECRET=1")
+    with running(tmp_path) as httpd:
+        yield httpd
+
+
+def get(conn, path):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def fetch(server, path, **headers):
+    """``(status, headers, body)`` of one GET on a fresh connection."""
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    return response.status, response.headers, response.read()
+
+
+@pytest.mark.parametrize("path", ["/", "/index.html", "/logo-g.png", f"/{DATA}", f"/{DATA}?manifest=1",
+                                  "/aggregated_data.strata/R0_Menopause.json"])
+def test_serves_dashboard_files(server, path):
+    conn = http.client.HTTPConnection(*server.server_address)
+    assert get(conn, path)[0] == 200
+
+
+@pytest.mark.parametrize("path", ["/cohort.json", "/cohort.state.json", "/.env", "/README.md",
+                                  "/aggregated_data.strata/../cohort.json", "/%2e%2e/etc/passwd",
+                                  "/aggregated_data.strata/"])
+def test_refuses_everything_else(server, path):
+    conn = http.client.HTTPConnection(*server.server_address)
+    assert get(conn, path)[0] == 404
+
+
+def test_keeps_the_connection_alive(server):
+    conn = http.client.HTTPConnection(*server.server_address)
+    for path in ("/", "/missing.json", f"/{DATA}"):
+        get(conn, path)
+    conn.request("GET", "/logo-g.png")
+    response = conn.getresponse()
+    assert response.version == 11 and not response.will_close
+    assert response.read() == b"\x89PNG"
+
+
+# ── Against real aggregated output ──────────────────────────────────────────
+
+@pytest.fixture(scope="module")
+def result(cohort, schema):
+    return quiet(agg.aggregate, cohort, schema, min_cell=5)
+
+
+@pytest.fixture(params=["single", "split"])
+def site(request, tmp_path, result, cohort, schema):
+    """A served directory holding aggregated output, whole or as a --split-strata manifest."""
+    quiet(agg.write_output, tmp_path / DATA, "cohort.json", len(cohort), schema, result, 5,
+          split=request.param == "split")
+    (tmp_path / "index.html").write_text("<!doctype html><title>dashboard</title>" + "<p>x</p>" * 400)
+    with running(tmp_path) as httpd:
+        yield httpd
+
+
+def expected_output(site):
+    """The single-file output the served directory holds (strata read back from shards)."""
+    with open(site.store.path) as f:
+        doc = json.load(f)
+    files = doc["meta"].pop("strata_files", None)
+    if files:
+        doc["strata"] = {k: json.loads((site.root / name).read_text())["strata"] for k, name in files.items()}
+    return doc
+
+
+@pytest.mark.parametrize("path", ["/", f"/{DATA}", f"/{DATA}?manifest=1", "/api/strata/R0_Menopause"])
+def test_matching_if_none_match_is_304(site, path):
+    status, headers, body = fetch(site, path)
+    etag = headers["ETag"]
+    assert status == 200 and body
+    assert etag.startswith('"') and etag.endswith('"')            # strong
+    assert fetch(site, path, **{"If-None-Match": etag})[:3:2] == (304, b"")
+    assert fetch(site, path, **{"If-None-Match": f"W/{etag}"})[0] == 304
+    assert fetch(site, path, **{"If-None-Match": '"other"'})[0] == 200
+
+
+@pytest.mark.parametrize("path", ["/", f"/{DATA}", f"/{DATA}?manifest=1", "/api/strata/R0_Menopause"])
+def test_gzip_is_negotiated(site, path):
+    _, plain_headers, plain = fetch(site, path)
+    status, headers, body = fetch(site, path, **{"Accept-Encoding": "gzip, deflate"})
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in headers["Vary"]
+    assert gzip.decompress(body) == plain
+    assert headers["ETag"] != plain_headers["ETag"]
+    assert "Content-Encoding" not in fetch(site, path, **{"Accept-Encoding": "gzip;q=0"})[1]
+
+
+def test_small_bodies_are_not_compressed(site):
+    (site.root / "small.html").write_text("<p>hi</p>")
+    status, headers, body = fetch(site, "/small.html", **{"Accept-Encoding": "gzip"})
+    assert status == 200 and "Content-Encoding" not in headers and body == b"<p>hi</p>"
+
+
+def test_up_to_date_gz_copy_is_served(site):
+    source = site.root / DATA
+    pre = site.root / f"{DATA}.gz"
+    # Distinguishable from the server's own compression, and decoding to the same JSON
+    pre.write_bytes(gzip.compress(source.read_bytes(), compresslevel=1, mtime=1))
+    st = source.stat()
+    os.utime(pre, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    status, headers, body = fetch(site, f"/{DATA}", **{"Accept-Encoding": "gzip"})
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    assert body == pre.read_bytes()
+
+    # The data is rewritten after its .gz copy: the copy is stale
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+    body = fetch(site, f"/{DATA}", **{"Accept-Encoding": "gzip"})[2]
+    assert body != pre.read_bytes() and gzip.decompress(body) == source.read_bytes()
+
+
+def test_strata_api_serves_each_stratifier_as_a_shard(site):
+    expected = expected_output(site)
+    assert expected["strata"]
+    for strat_key, block in expected["strata"].items():
+        status, headers, body = fetch(site, f"/api/strata/{strat_key}")
+        assert status == 200 and headers["Content-Type"] == "application/json"
+        assert json.loads(body) == {"created": expected["meta"]["created"], "strat_key": strat_key,
+                                    "strata": block}
+
+
+@pytest.mark.parametrize("key", ["not_a_variable", "", "R0_Menopause/x"])
+def test_strata_api_404s_for_an_unknown_stratifier(site, key):
+    assert fetch(site, f"/api/strata/{key}")[0] == 404
+
+
+def test_manifest_points_strata_at_the_api(site):
+    expected = expected_output(site)
+    status, _, body = fetch(site, f"/{DATA}?manifest=1")
+    manifest = json.loads(body)
+    assert status == 200 and "strata" not in manifest
+    files = manifest["meta"].pop("strata_files")
+    assert files == {k: f"api/strata/{k}" for k in expected.pop("strata")}
+    assert manifest == expected
+
+
+def test_store_reloads_when_the_data_file_changes(site):
+    path = site.store.path
+    before = json.loads(fetch(site, f"/{DATA}?manifest=1")[2])
+    etag = fetch(site, "/api/strata/R0_Menopause")[1]["ETag"]
+
+    doc = json.loads(path.read_text())
+    doc["meta"]["created"] = "2000-01-01T00:00:00+00:00"
+    doc["meta"]["n"] += 1
+    st = path.stat()
+    path.write_text(json.dumps(doc))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    after = json.loads(fetch(site, f"/{DATA}?manifest=1")[2])
+    assert after["meta"]["n"] == before["meta"]["n"] + 1
+    assert after["meta"]["created"] == "2000-01-01T00:00:00+00:00"
+    status, headers, body = fetch(site, "/api/strata/R0_Menopause", **{"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag
+    assert json.loads(body)["created"] == "2000-01-01T00:00:00+00:00"
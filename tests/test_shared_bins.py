@@ -0,0 +1,54 @@
+"""Every histogram is binned against its variable's whole-cohort edges."""
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet, read_output
+
+
+@pytest.fixture(scope="module")
+def output(tmp_path_factory, cohort, schema):
+    result = quiet(agg.aggregate, cohort, schema, min_cell=0)
+    path = tmp_path_factory.mktemp("bins") / "out.json"
+    quiet(agg.write_output, path, "cohort.json", len(cohort), schema, result, 0)
+    return read_output(path)
+
+
+def values(records, key, schema):
+    return sorted(float(v) for v in agg.get_valid(records, key, schema[key].get("sentinel")))
+
+
+def test_schema_bins_are_the_whole_cohort_layout(output, cohort, schema):
+    binned = {k: s["bins"] for k, s in output["schema"].items() if "bins" in s}
+    assert binned
+    for key, bins in binned.items():
+        nums = values(cohort, key, schema)
+        layout = agg.shared_bins(schema[key]["type"], nums)
+        assert bins == {"labels": layout[0], "edges": agg.bin_edges(layout)}
+        assert len(bins["edges"]) == len(bins["labels"]) + 1
+        assert bins["edges"][0] <= nums[0] and nums[-1] <= bins["edges"][-1]
+
+
+def test_every_stratum_histogram_uses_those_bins(output, cohort, schema):
+    checked = 0
+    for key, entry in output["schema"].items():
+        if "bins" not in entry:
+            continue
+        layout = agg.shared_bins(schema[key]["type"], values(cohort, key, schema))
+        n_bins = len(entry["bins"]["labels"])
+        assert sum(output["whole_cohort"][key]["histogram"]["counts"]) == output["whole_cohort"][key]["n_valid"]
+        for strat_key, groups in output["strata"].items():
+            for gk, g in groups.items():
+                stats = g["variables"][key]
+                hist = stats["histogram"]
+                assert "labels" not in hist
+                if not stats["n_valid"]:
+                    assert hist["counts"] == []
+                    continue
+                members = [r for r in cohort if r.get(strat_key) is not None
+                           and agg.value_key(r[strat_key]) == gk]
+                assert len(hist["counts"]) == n_bins
+                assert sum(hist["counts"]) == stats["n_valid"]
+                assert hist["counts"] == agg.bin_fill(values(members, key, schema), layout)
+                checked += 1
+    assert checked
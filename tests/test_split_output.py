@@ -0,0 +1,38 @@
+"""--split-strata shards recombine into the single-file output."""
+
+import gzip
+import json
+
+import pytest
+
+from conftest import read_output, run_main
+
+
+@pytest.mark.parametrize("fmt", ["verbose", "compact"])
+def test_shards_recombine_into_single_file(monkeypatch, tmp_path, write_json, cohort, fmt):
+    source = write_json("cohort.json", cohort)
+    single, split = tmp_path / "single.json", tmp_path / "split.json"
+    run_main(monkeypatch, "--input", source, "--output", single, "--no-cache", "--format", fmt)
+    run_main(monkeypatch, "--input", source, "--output", split, "--no-cache", "--format", fmt,
+             "--split-strata", "--gzip")
+
+    with open(split) as f:
+        manifest = json.load(f)
+    created = manifest["meta"].pop("created")
+    files = manifest["meta"].pop("strata_files")
+    assert "strata" not in manifest
+    assert set(files) == set(manifest["meta"]["strat_variables"])
+
+    strata = {}
+    for strat_key, name in files.items():
+        path = tmp_path / name
+        assert path.parent == tmp_path / "split.strata"
+        shard = json.loads(path.read_bytes())
+        assert json.loads(gzip.decompress((tmp_path / f"{name}.gz").read_bytes())) == shard
+        assert shard["created"] == created and shard["strat_key"] == strat_key
+        strata[strat_key] = shard["strata"]
+    assert json.loads(gzip.decompress(split.with_name("split.json.gz").read_bytes()))["meta"]["created"] == created
+
+    expected = read_output(single)
+    assert expected.pop("strata") == strata
+    assert manifest == expected
@@ -0,0 +1,67 @@
+"""Shard state files merged in input order must reproduce a single run."""
+
+import pytest
+
+import aggregate_data as agg
+from conftest import quiet, read_output, run_main
+
+
+def shard_states(cohort, schema, tmp_path, bounds):
+    paths = []
+    for i, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+        state = quiet(agg.state_from_records, cohort[lo:hi], schema, chunk_size=50, progress=False)
+        state["source_files"] = [f"site{i}.json"]
+        path = tmp_path / f"site{i}.state.json"
+        agg.save_state(state, path)
+        paths.append(path)
+    return paths
+
+
+def test_merged_shards_match_full_run(tmp_path, cohort, schema):
+    paths = shard_states(cohort, schema, tmp_path, [0, 90, 91, 250, len(cohort)])
+    state = agg.load_state(paths[0])
+    for path in paths[1:]:
+        agg.merge_state(state, agg.load_state(path))
+    assert state["n"] == len(cohort)
+    assert agg.finalise_state(state, schema, min_cell=5) == quiet(agg.aggregate, cohort, schema, min_cell=5)
+
+
+def test_state_files_are_private(tmp_path, cohort, schema):
+    path, = shard_states(cohort, schema, tmp_path, [0, 10])
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_merge_rejects_other_schemas(cohort, schema):
+    a = quiet(agg.state_from_records, cohort[:20], schema, progress=False)
+    b = quiet(agg.state_from_records, cohort[20:40], schema, progress=False)
+    b["schema_keys"] = b["schema_keys"][:-1]
+    with pytest.raises(ValueError, match="schema_keys"):
+        agg.merge_state(a, b)
+
+
+def test_shard_and_merge_commands(monkeypatch, tmp_path, write_json, cohort):
+    write_json("site1.json", cohort[:150])
+    write_json("site2.json", cohort[150:])
+    full = write_json("full.json", cohort)
+    for site in ("site1", "site2"):
+        run_main(monkeypatch, "shard", "--input", tmp_path / f"{site}.json",
+                 "--state", tmp_path / f"{site}.state.json")
+    run_main(monkeypatch, "merge", tmp_path / "site1.state.json", tmp_path / "site2.state.json",
+             "--output", tmp_path / "merged.json", "--format", "compact")
+    run_main(monkeypatch, "--input", full, "--output", tmp_path / "direct.json", "--format", "compact",
+             "--no-cache")
+
+    merged, direct = read_output(tmp_path / "merged.json"), read_output(tmp_path / "direct.json")
+    assert merged["meta"].pop("source_file") == "site1.json + site2.json"
+    direct["meta"].pop("source_file")
+    assert merged == direct
+
+
+def test_merge_asks_to_rebuild_states_from_another_schema(monkeypatch, tmp_path, write_json, cohort, capsys):
+    write_json("site1.json", cohort)
+    run_main(monkeypatch, "shard", "--input", tmp_path / "site1.json", "--state", tmp_path / "site1.state.json")
+    monkeypatch.delitem(agg.SCHEMA, "R0_BMI")
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, "merge", tmp_path / "site1.state.json", "--output", tmp_path / "merged.json")
+    assert exit_info.value.code == 2
+    assert "different SCHEMA (no longer has R0_BMI); rebuild them" in capsys.readouterr().err
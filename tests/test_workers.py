@@ -0,0 +1,23 @@
+"""A process pool must give the same result as a serial run."""
+
+import aggregate_data as agg
+from conftest import quiet
+
+
+def test_worker_pool_matches_serial(cohort, schema):
+    serial = quiet(agg.aggregate, cohort, schema, min_cell=5)
+    assert quiet(agg.aggregate, cohort, schema, min_cell=5, workers=3) == serial
+
+
+def test_worker_pool_reports_every_task(cohort, schema):
+    reports = {}
+    for workers in (1, 2):
+        profile = agg.RunProfile()
+        quiet(agg.aggregate, cohort, schema, workers=workers, profile=profile)
+        reports[workers] = profile.report()
+    names = [p["name"] for p in reports[2]["phases"]]
+    strat_vars = agg.find_strat_vars(schema, cohort[0])
+    assert names.count("whole_cohort") == 1
+    assert [n for n in names if n.startswith("stratify:")] == [f"stratify:{k}" for k in strat_vars]
+    # Counters from the workers are folded back into the parent's
+    assert reports[2]["counters"]["cells_summarised"] == reports[1]["counters"]["cells_summarised"]